@@ -18,10 +18,10 @@ SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
     poolclass=QueuePool,
-    pool_size=10,  # Número de conexiones en el pool
-    max_overflow=20,  # Conexiones adicionales permitidas
+    pool_size=20,  # Número de conexiones en el pool
+    max_overflow=40,  # Conexiones adicionales permitidas
     pool_pre_ping=True,  # Verificar conexiones antes de usar
-    pool_recycle=3600,  # Reciclar conexiones cada hora
+    pool_recycle=1800,  # Reciclar conexiones cada 30 minutos
     echo=False,  # Cambiar a True para debug de SQL
     connect_args={
         "autocommit": False,
@@ -33,7 +33,10 @@ engine = create_engine(
     }
 )
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# expire_on_commit=False: las sesiones son por petición y los objetos no se
+# reutilizan entre transacciones, así que no hace falta recargarlos con un
+# SELECT extra la primera vez que se leen después del commit
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 
 Base = declarative_base()
 
@@ -2,10 +2,12 @@ from fastapi import FastAPI
 from database import Base, engine, wait_for_database, test_connection
 from config.settings import settings
 from config.cors import setup_cors
+from utils.async_logging import setup_buffered_logging
 import logging
 
-# Configurar logging
+# Configurar logging (la E/S de log corre en un hilo de fondo)
 logging.basicConfig(level=logging.INFO)
+setup_buffered_logging(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Importar todos los routers
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, Boolean, Integer, ForeignKey, Text
+from sqlalchemy import Column, String, DateTime, Boolean, Integer, ForeignKey, Index, Text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -13,6 +13,9 @@ from datetime import datetime
 class PaymentUser(Base):
     """Modelo para usuarios con información de pago"""
     __tablename__ = "payment_users"
+    # Índice compuesto que cubre el patrón WHERE cedula=? AND is_active=1
+    # de las validaciones, sin volver a la tabla a filtrar is_active
+    __table_args__ = (Index("ix_payment_users_cedula_active", "cedula", "is_active"),)
     
     id = Column(Integer, primary_key=True, index=True)
     cedula = Column(String(20), unique=True, index=True, nullable=False)
@@ -22,9 +25,19 @@ class PaymentUser(Base):
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
 
+    # Comprobantes activos del usuario; viewonly porque la relación va por
+    # cédula (columna única, no FK declarada) y solo se usa para lecturas
+    receipts = relationship(
+        "PaymentReceipt",
+        primaryjoin="and_(PaymentUser.cedula == foreign(PaymentReceipt.cedula), PaymentReceipt.is_active == True)",
+        viewonly=True,
+    )
+
 class PaymentReceipt(Base):
     """Modelo para comprobantes de pago"""
     __tablename__ = "payment_receipts"
+    # Mismo patrón de acceso que payment_users en find_user_receipts
+    __table_args__ = (Index("ix_payment_receipts_cedula_active", "cedula", "is_active"),)
     
     id = Column(Integer, primary_key=True, index=True)
     cedula = Column(String(20), nullable=False, index=True)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from sqlalchemy import Column, String, DateTime, Boolean, func
+from sqlalchemy import Column, String, DateTime, Boolean, Index, JSON, func
 from database import Base
 import enum
 from typing import List, Optional, Any, Dict
@@ -49,10 +49,17 @@ class WhatsappUser(Base):
     is_active = Column(Boolean, default=True)
     inactivity_warning_sent = Column(Boolean, default=False)
     conversation_state = Column(String(50), nullable=True)  # Estado de la conversación
-    conversation_data = Column(String(1000), nullable=True)  # Datos temporales de la conversación (JSON)
+    # Datos temporales de la conversación: columna JSON nativa, SQLAlchemy
+    # (de)serializa solo; el flujo actual los mantiene en memoria
+    conversation_data = Column(JSON, nullable=True)
 
 class Message(Base):
     __tablename__ = "messages"
+    # El historial se consulta siempre por número ordenado por fecha; el
+    # índice compuesto cubre ese patrón sin ordenamiento adicional (filesort)
+    __table_args__ = (
+        Index("ix_messages_phone_timestamp", "phone_number", "timestamp"),
+    )
 
     id = Column(String(100), primary_key=True, index=True)
     phone_number = Column(String(50), index=True)
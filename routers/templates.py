@@ -3,6 +3,7 @@ from typing import List, Dict, Any, Optional
 from sqlalchemy.orm import Session
 import json
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
@@ -589,8 +590,9 @@ async def create_template_with_file(
         # Validar el tipo de archivo
         import mimetypes
         
-        # Obtener la extensión del archivo
-        file_extension = file.filename.lower().split('.')[-1] if '.' in file.filename else ''
+        # Obtener la extensión del archivo (splitext es correcto con nombres
+        # sin punto y no construye la lista intermedia de split)
+        file_extension = os.path.splitext(file.filename)[1].lower().lstrip('.')
         
         # Mapeo de extensiones a tipos MIME para WhatsApp
         extension_to_mime = {
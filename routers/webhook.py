@@ -72,19 +72,28 @@ async def receive_webhook(request: Request):
                                 
                                 if result["success"]:
                                     user_message = result["message"]
-                                    
+
+                                    # Capturar los datos antes del commit para no
+                                    # disparar un SELECT de refresco al expirar la instancia
+                                    user_message_id = str(user_message.id)
+                                    user_message_timestamp = user_message.timestamp.isoformat()
+
                                     # Procesar mensaje y generar respuesta
                                     response_text = await process_message(message_text, contact_name, from_number, db)
-                                    
+
+                                    # Cerrar la transacción del evento: cubre el INSERT
+                                    # del mensaje y cualquier escritura de process_message
+                                    db.commit()
+
                                     # Notificar a los clientes WebSocket
                                     websocket_message = {
                                         "type": "new_message",
                                         "message": {
-                                            "id": str(user_message.id),
+                                            "id": user_message_id,
                                             "phone_number": from_number,
                                             "text": message_text,
                                             "sender": "user",
-                                            "timestamp": user_message.timestamp.isoformat(),
+                                            "timestamp": user_message_timestamp,
                                             "contact_name": contact_name
                                         }
                                     }
@@ -6,10 +6,15 @@ from utils.websocket_manager import manager
 from services.whatsapp_service import send_whatsapp_message
 from services.bot_service import process_message, send_message_to_user
 from datetime import datetime
+import asyncio
 import json
 
 router = APIRouter(tags=["websocket"])
 
+# Tamaño máximo de un frame entrante; los frames mayores se rechazan
+# antes de entrar al parser JSON
+MAX_WS_MESSAGE_CHARS = 64 * 1024
+
 @router.websocket("/ws/{phone_number}")
 async def websocket_endpoint(websocket: WebSocket, phone_number: str):
     """WebSocket específico para un número de teléfono"""
@@ -28,7 +33,22 @@ async def websocket_general(websocket: WebSocket):
     try:
         while True:
             data = await websocket.receive_text()
-            
+
+            # Rechazar frames desmesurados sin parsearlos. Al salir por aquí
+            # no pasa por el except WebSocketDisconnect, así que hay que
+            # retirar la conexión del manager o quedaría registrada para
+            # siempre con el socket ya cerrado
+            if len(data) > MAX_WS_MESSAGE_CHARS:
+                await websocket.close(code=1009)
+                manager.disconnect_general(websocket)
+                break
+
+            # Atajo: si el frame no parece un objeto JSON, responder como
+            # texto simple sin pasar por el parser
+            if not data.startswith('{'):
+                await websocket.send_text(f"Mensaje recibido: {data}")
+                continue
+
             try:
                 # Intentar parsear el mensaje como JSON
                 message_data = json.loads(data)
@@ -43,8 +63,11 @@ async def websocket_general(websocket: WebSocket):
                         db = next(get_db())
                         
                         try:
-                            # Usar el servicio para enviar mensaje
-                            success, new_message, error_msg = send_message_to_user(
+                            # Usar el servicio para enviar mensaje.
+                            # Se ejecuta en un hilo para no bloquear el event loop
+                            # con el HTTP a WhatsApp ni con el commit a la BD
+                            success, new_message, error_msg = await asyncio.to_thread(
+                                send_message_to_user,
                                 db=db,
                                 phone_number=phone_number,
                                 message=message_text
@@ -64,8 +87,11 @@ async def websocket_general(websocket: WebSocket):
                                     }
                                 }
                                 
-                                await manager.send_message_to_all(response)
-                                await manager.send_message_to_phone(phone_number, response)
+                                # Difundir a ambos grupos de conexiones en paralelo
+                                await asyncio.gather(
+                                    manager.send_message_to_all(response),
+                                    manager.send_message_to_phone(phone_number, response)
+                                )
                             else:
                                 # Error enviando mensaje
                                 error_response = {
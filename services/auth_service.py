@@ -1,11 +1,23 @@
 import os
+import hashlib
+import time
 import requests
-from typing import Optional, Dict, Any
-from jose import JWTError, jwt
+from typing import Optional, Dict, Any, Tuple
+import jwt as pyjwt
 from datetime import datetime, timedelta
 import json
 
+# Tiempo (segundos) durante el cual se considera válido un access token ya verificado
+TOKEN_VALIDATION_CACHE_TTL = 60
+
+# Tiempo (segundos) durante el cual se cachea el resultado de verificar un JWT
+JWT_VERIFY_CACHE_TTL = 30
+
 class AuthService:
+    # Sesión HTTP compartida con keep-alive: todas las llamadas a Laravel
+    # reutilizan la misma conexión TCP/TLS en lugar de abrir una por petición
+    _session = requests.Session()
+
     def __init__(self):
         self.client_id = os.getenv("OAUTH_CLIENT_ID")
         self.client_secret = os.getenv("OAUTH_CLIENT_SECRET")
@@ -16,6 +28,19 @@ class AuthService:
         
         if not all([self.client_id, self.client_secret, self.redirect_uri, self.token_url, self.user_url]):
             raise ValueError("Faltan variables de entorno OAuth requeridas")
+
+        # URLs derivadas, calculadas una sola vez en lugar de por llamada
+        self.roles_url = self.user_url.replace('/api/user', '/api/me/roles-permisos')
+        self.logout_url = self.user_url.replace('/api/user', '/api/logout')
+
+        # Secret en bytes para que la librería JWT no lo codifique en cada llamada
+        self._jwt_secret_bytes = self.jwt_secret.encode() if self.jwt_secret else None
+
+        # Cache de validaciones de token recientes: hash del token -> (es_válido, expira_en)
+        self._token_validation_cache: Dict[str, Tuple[bool, float]] = {}
+
+        # Cache de verificaciones de JWT recientes: hash del token -> (payload, expira_en)
+        self._jwt_verify_cache: Dict[str, Tuple[Optional[Dict[str, Any]], float]] = {}
     
     async def exchange_code_for_token(self, code: str) -> Optional[Dict[str, Any]]:
         """
@@ -34,7 +59,7 @@ class AuthService:
                 'Accept': 'application/json',
             }
             
-            response = requests.post(self.token_url, data=data, headers=headers)
+            response = self._session.post(self.token_url, data=data, headers=headers)
             
             if response.status_code == 200:
                 token_data = response.json()
@@ -59,11 +84,11 @@ class AuthService:
             
             # Log para obtener la IP que está haciendo la petición
             print(f"Realizando petición a {self.user_url} con IP de origen")
-            ip_check_response = requests.get('https://api.ipify.org?format=json')
+            ip_check_response = self._session.get('https://api.ipify.org?format=json')
             if ip_check_response.status_code == 200:
                 print(f"IP de origen: {ip_check_response.json().get('ip')}")
             
-            response = requests.get(self.user_url, headers=headers)
+            response = self._session.get(self.user_url, headers=headers)
             
             if response.status_code == 200:
                 user_data = response.json()
@@ -86,9 +111,7 @@ class AuthService:
                 'Accept': 'application/json',
             }
             
-            # Construir URL del endpoint de roles y permisos
-            roles_url = self.user_url.replace('/api/user', '/api/me/roles-permisos')
-            response = requests.get(roles_url, headers=headers)
+            response = self._session.get(self.roles_url, headers=headers)
             
             if response.status_code == 200:
                 roles_data = response.json()
@@ -121,7 +144,7 @@ class AuthService:
                 'iat': datetime.utcnow(),
             }
             
-            token = jwt.encode(payload, self.jwt_secret, algorithm='HS256')
+            token = pyjwt.encode(payload, self._jwt_secret_bytes, algorithm='HS256')
             return token
             
         except Exception as e:
@@ -130,22 +153,78 @@ class AuthService:
     
     def verify_jwt_token(self, token: str) -> Optional[Dict[str, Any]]:
         """
-        Verifica y decodifica un JWT token
+        Verifica y decodifica un JWT token.
+        Los tokens verificados recientemente se resuelven desde un cache
+        en memoria sin repetir el HMAC
         """
+        token_key = hashlib.sha256(token.encode()).hexdigest()
+        now = time.monotonic()
+
+        cached = self._jwt_verify_cache.get(token_key)
+        if cached and cached[1] > now:
+            return cached[0]
+
         try:
-            payload = jwt.decode(token, self.jwt_secret, algorithms=['HS256'])
-            return payload
-        except JWTError as e:
+            payload = pyjwt.decode(token, self._jwt_secret_bytes, algorithms=['HS256'])
+        except pyjwt.InvalidTokenError as e:
             print(f"Error verificando JWT: {e}")
-            return None
+            payload = None
+
+        self._jwt_verify_cache[token_key] = (payload, now + JWT_VERIFY_CACHE_TTL)
+
+        # Purgar entradas vencidas para que el cache no crezca sin límite
+        if len(self._jwt_verify_cache) > 128:
+            self._jwt_verify_cache = {
+                key: value for key, value in self._jwt_verify_cache.items()
+                if value[1] > now
+            }
+
+        return payload
     
+    async def _probe_token(self, access_token: str) -> bool:
+        """
+        Verifica un access token consultando solo el código de estado,
+        sin descargar ni parsear el perfil completo del usuario
+        """
+        headers = {
+            'Authorization': f'Bearer {access_token}',
+            'Accept': 'application/json',
+        }
+
+        response = self._session.head(self.user_url, headers=headers)
+
+        # Si Laravel no acepta HEAD, reintentar con GET sin leer el cuerpo
+        if response.status_code in (405, 501):
+            response = self._session.get(self.user_url, headers=headers, stream=True)
+            response.close()
+
+        return 200 <= response.status_code < 300
+
     async def validate_access_token(self, access_token: str) -> bool:
         """
-        Valida si un access token sigue siendo válido con Laravel Passport
+        Valida si un access token sigue siendo válido con Laravel Passport.
+        Las validaciones recientes se cachean brevemente para no golpear
+        Laravel en cada petición autenticada
         """
         try:
-            user_info = await self.get_user_info(access_token)
-            return user_info is not None
+            token_key = hashlib.sha256(access_token.encode()).hexdigest()
+            now = time.monotonic()
+
+            cached = self._token_validation_cache.get(token_key)
+            if cached and cached[1] > now:
+                return cached[0]
+
+            is_valid = await self._probe_token(access_token)
+            self._token_validation_cache[token_key] = (is_valid, now + TOKEN_VALIDATION_CACHE_TTL)
+
+            # Purgar entradas vencidas para que el cache no crezca sin límite
+            if len(self._token_validation_cache) > 128:
+                self._token_validation_cache = {
+                    key: value for key, value in self._token_validation_cache.items()
+                    if value[1] > now
+                }
+
+            return is_valid
         except Exception as e:
             print(f"Error validando access token: {e}")
             return False
@@ -155,16 +234,14 @@ class AuthService:
         Revoca un access token en Laravel Passport
         """
         try:
-            # Laravel Passport no tiene endpoint estándar de revoke, 
+            # Laravel Passport no tiene endpoint estándar de revoke,
             # pero podemos usar el logout del AuthController
-            logout_url = self.user_url.replace('/api/user', '/api/logout')
-            
             headers = {
                 'Authorization': f'Bearer {access_token}',
                 'Accept': 'application/json',
             }
-            
-            response = requests.post(logout_url, headers=headers)
+
+            response = self._session.post(self.logout_url, headers=headers)
             return response.status_code in [200, 204]
             
         except Exception as e:
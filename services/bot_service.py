@@ -4,14 +4,21 @@ Este archivo maneja todas las funcionalidades relacionadas con el chatbot,
 los mensajes y las conversaciones con usuarios
 """
 
+from sqlalchemy import func, insert
 from sqlalchemy.orm import Session
 from models.whatsapp_models import WhatsappUser, Message
-from services.whatsapp_service import send_whatsapp_message, create_or_update_whatsapp_user
+from services.whatsapp_service import send_whatsapp_message, send_whatsapp_message_with_response, create_or_update_whatsapp_user
 from services.receipt_service import ReceiptService
 from services.validation_service import ValidationService
-from typing import Tuple, Optional, Dict, Any
+from utils.conversation_state import conversation_store
+from typing import Tuple, Optional, List, Dict, Any
+from types import MappingProxyType
 from datetime import datetime
-import json
+import asyncio
+import logging
+import re
+
+logger = logging.getLogger(__name__)
 
 # Mensajes constantes
 WELCOME_MESSAGE = (
@@ -32,293 +39,363 @@ MENU_RETURN_MESSAGE = (
     "(' *0* ', ' *menu* ', ' *volver* ' o ' *salir* ')."
 )
 
+# Mapeo de opciones de texto a números (inmutable, compartido entre llamadas)
+OPTION_MAP = MappingProxyType({
+    '1': '1', 'contacto': '1',
+    '2': '2', 'pago': '2', 'comprobante': '2',
+    '3': '3', 'animo': '3', 'ánimo': '3',
+    '4': '4', 'queja': '4', 'denuncia': '4',
+    '5': '5', 'datos': '5',
+    '6': '6', 'suscripcion': '6', 'suscripción': '6',
+})
+
+CONTACT_MESSAGE = (
+    "*📲 Lineas de atención*\n\n"
+    "Nuestras líneas de atención están habilitadas para brindarte soporte y orientación.\n\n"
+    "*Horario de atención:*\n\n"
+    "*Lunes a Viernes:*\n"
+    "06:55 a.m. a 3:30 p.m.\n\n"
+    "*Sabados:*\n"
+    "06:55 a.m. a 12:30 m.\n\n"
+    "👩‍💼 *Área de Talento Humano:*\n"
+    "322 513 7306\n\n"
+    "🧾 *Área de Contabilidad:*\n"
+    "310 336 7098\n\n"
+    "🦺 *Área de SST:*\n"
+    "311 569 1769\n\n"
+    "🌐 *Página web:*\n"
+    "www.agrojurado.com\n\n"
+    "📧 *Correo electrónico:*\n"
+    "info@agrojurado.com\n\n"
+
+    "_Escribe *Menú* o *Volver* para regresar al menú principal._"
+)
+
+# Plantillas con {display_name} como único dato dinámico
+DATA_TREATMENT_MESSAGE_TEMPLATE = (
+    "📄 *Tratamiento de Datos Personales*\n\n"
+    "Hola {display_name}, te informamos que Agropecuaria Juradó S.A.S., en cumplimiento de la Ley 1581 de 2012, "
+    "los datos personales que nos suministras serán tratados conforme a nuestra política de tratamiento de datos "
+    "y confidencialidad. No se compartirán con terceros sin tu autorización.\n\n"
+    "_Para más detalles, puedes consultar nuestra política completa en nuestro sitio web: www.agrojurado.com_"
+)
+
+COMPLAINT_MESSAGE_TEMPLATE = (
+    "📢 *Realizar una queja o denuncia*\n\n"
+    "Hola {display_name}, para realizar una petición, queja, reclamo, sugerencia o denuncia, "
+    "puedes hacerlo a través del formulario PQRS en nuestra página web:\n\n"
+    "🌐 https://www.agrojurado.com/pqrs\n\n"
+    "📧 pqrs@agrojurado.com\n\n"
+    "📞 322 513 7306\n\n"
+
+    "También puedes radicar tu solicitud de forma anónima desde el mismo formulario si así lo prefieres.\n\n"
+    "Todas las solicitudes serán atendidas conforme a nuestros tiempos de respuesta establecidos.\n\n"
+    "_Escribe *Menú* o *Volver* para regresar al menú principal._"
+)
+
+MOOD_MESSAGE_TEMPLATE = (
+    "😊 *Estado de ánimo*\n\n"
+    "Hola {display_name}, actualmente esta opción no está disponible.\n\n"
+    "_Escribe *Menú* o *Volver* para regresar al menú principal._"
+)
+
+# Palabras que cancelan el flujo de comprobantes (frozenset: membresía O(1))
+_CANCEL_KEYWORDS = frozenset({'cancelar', 'cancel', 'menu', 'menú', 'volver', 'atras', 'atrás', 'salir', '0'})
+
+RECEIPT_PROCESS_ERROR_MESSAGE = "❌ Error en el proceso. Por favor, inicia nuevamente seleccionando 'Mi comprobante de pago'."
+
+CEDULA_NOT_REGISTERED_TEMPLATE = (
+    "❌ La cédula {cedula} no existe en nuestros registros.\n\n"
+    "Por favor, ingresa tu número de cédula nuevamente:"
+)
+
+EXPEDITION_DATE_PROMPT_TEMPLATE = (
+    "¡Hola {name}! ☺️\n\n"
+    "para continuar, por favor ingresa la\n"
+    "*fecha de expedición de tu cédula*.\n\n"
+    "La fecha debe estar en formato:\n"
+    "*DD/MM/AAAA*\n\n"
+    "Ejemplo: *15/03/1990*"
+)
+
+RECEIPT_SELECTION_PROMPT = "❌ Por favor, responde con '1' para la quincena anterior o '2' para la quincena reciente."
+
+RECEIPT_INIT_MESSAGE = (
+    "🧾 *Comprobante de Pago*\n\n"
+    "Para buscar tu comprobante de pago por favor, *ingresa tu número de cédula*\n"
+    "_(solo números y sin espacio)_.\n\n"
+    "Ejemplo: *1001234567*\n\n"
+    "💡 _Escribe *cancelar* en cualquier momento para volver al menú principal_"
+)
+
+# Alternación compilada con todas las palabras clave del menú: un solo
+# recorrido del mensaje en C en lugar de un escaneo por palabra clave.
+# Los \b evitan coincidencias dentro de palabras más largas (p. ej. el
+# '1' de una fecha como 15/03/1990)
+_OPTION_RE = re.compile(r"\b(?:" + "|".join(map(re.escape, OPTION_MAP)) + r")\b")
+
+def classify_option(message: str) -> Optional[str]:
+    """Clasifica un mensaje ya normalizado a un número de opción del menú.
+
+    Devuelve el número de opción ('1'..'6') o None si el mensaje no
+    contiene ninguna palabra clave reconocida.
+    """
+    match = _OPTION_RE.search(message)
+    return OPTION_MAP[match.group()] if match else None
+
+def _get_user_by_phone(db: Session, phone_number: str) -> Optional[WhatsappUser]:
+    """Busca un usuario de WhatsApp por su clave primaria.
+
+    Session.get consulta primero el identity map de la sesión: si el
+    usuario ya se cargó en este request, no se emite ningún SQL.
+    """
+    return db.get(WhatsappUser, phone_number)
+
 def get_display_name(user_phone_number: str, user_name: str, db: Session) -> str:
     """Obtiene el nombre de display desde la base de datos o usa el nombre de WhatsApp como fallback"""
-    user = db.query(WhatsappUser).filter(WhatsappUser.phone_number == user_phone_number).first()
+    user = _get_user_by_phone(db, user_phone_number)
     return user.name if user and user.name else user_name
 
+# =====================================================
+# HANDLERS DE OPCIONES DEL MENÚ
+# =====================================================
+
+def _handle_contact(db: Session, user, display_name: str) -> str:
+    """Opción 1: líneas de atención"""
+    return CONTACT_MESSAGE
+
+def _handle_receipt_start(db: Session, user, display_name: str) -> str:
+    """Opción 2: iniciar flujo de comprobante de pago"""
+    conversation_store.set(user.phone_number, "waiting_cedula")
+    return RECEIPT_INIT_MESSAGE
+
+def _handle_mood(db: Session, user, display_name: str) -> str:
+    """Opción 3: estado de ánimo"""
+    return MOOD_MESSAGE_TEMPLATE.format(display_name=display_name)
+
+def _handle_complaint(db: Session, user, display_name: str) -> str:
+    """Opción 4: realizar una queja o denuncia"""
+    return COMPLAINT_MESSAGE_TEMPLATE.format(display_name=display_name)
+
+def _handle_data_treatment(db: Session, user, display_name: str) -> str:
+    """Opción 5: tratamiento de datos"""
+    return DATA_TREATMENT_MESSAGE_TEMPLATE.format(display_name=display_name)
+
+def _handle_unsubscribe(db: Session, user, display_name: str) -> str:
+    """Opción 6: cancelar suscripción"""
+    if user:
+        # El commit lo hace process_message al cerrar el turno
+        user.is_active = False
+        return "Tu suscripción ha sido cancelada. No recibirás más mensajes de nuestra parte a menos que nos vuelvas a contactar."
+    return "No se pudo encontrar tu suscripción para cancelar."
+
+# Despacho O(1) de opción -> handler, en lugar de una cadena de if/elif
+OPTION_HANDLERS = MappingProxyType({
+    '1': _handle_contact,
+    '2': _handle_receipt_start,
+    '3': _handle_mood,
+    '4': _handle_complaint,
+    '5': _handle_data_treatment,
+    '6': _handle_unsubscribe,
+})
+
 async def process_message(message: str, user_name: str, user_phone_number: str, db: Session) -> str:
     """Procesa el mensaje del usuario y retorna la respuesta apropiada"""
-    
-    message = message.lower().strip()
-    
-    # Crear o actualizar usuario en la base de datos
-    create_or_update_whatsapp_user(db, user_phone_number, user_name)
-    
-    # Obtener el nombre de display
-    display_name = get_display_name(user_phone_number, user_name, db)
-    
-    # Mensajes reutilizables (definidos después de obtener display_name)
-    CONTACT_MESSAGE = (
-        "*📲 Lineas de atención*\n\n"
-        "Nuestras líneas de atención están habilitadas para brindarte soporte y orientación.\n\n"
-        "*Horario de atención:*\n\n"
-        "*Lunes a Viernes:*\n"
-        "06:55 a.m. a 3:30 p.m.\n\n"
-        "*Sabados:*\n"
-        "06:55 a.m. a 12:30 m.\n\n"
-        "👩‍💼 *Área de Talento Humano:*\n"
-        "322 513 7306\n\n"
-        "🧾 *Área de Contabilidad:*\n"
-        "310 336 7098\n\n"
-        "🦺 *Área de SST:*\n"
-        "311 569 1769\n\n"
-        "🌐 *Página web:*\n"
-        "www.agrojurado.com\n\n"
-        "📧 *Correo electrónico:*\n"
-        "info@agrojurado.com\n\n"
-
-        "_Escribe *Menú* o *Volver* para regresar al menú principal._"
-    )
-    
-    DATA_TREATMENT_MESSAGE = (
-        "📄 *Tratamiento de Datos Personales*\n\n"
-        f"Hola {display_name}, te informamos que Agropecuaria Juradó S.A.S., en cumplimiento de la Ley 1581 de 2012, "
-        "los datos personales que nos suministras serán tratados conforme a nuestra política de tratamiento de datos "
-        "y confidencialidad. No se compartirán con terceros sin tu autorización.\n\n"
-        "_Para más detalles, puedes consultar nuestra política completa en nuestro sitio web: www.agrojurado.com_"
-    )
-    
-    RECEIPT_INIT_MESSAGE = (
-        "🧾 *Comprobante de Pago*\n\n"
-        "Para buscar tu comprobante de pago por favor, *ingresa tu número de cédula*\n"
-        "_(solo números y sin espacio)_.\n\n"
-        "Ejemplo: *1001234567*\n\n"
-        "💡 _Escribe *cancelar* en cualquier momento para volver al menú principal_"
-    )
-    
-    # Obtener el estado de conversación del usuario
-    user = db.query(WhatsappUser).filter(WhatsappUser.phone_number == user_phone_number).first()
-    
-    print(f"🔍 DEBUG: Usuario encontrado: {user is not None}")
-    if user:
-        print(f"🔍 DEBUG: Estado de conversación: '{user.conversation_state}'")
-        print(f"🔍 DEBUG: Datos de conversación: '{user.conversation_data}'")
-    
+
+    # Normalizar una sola vez, evitando alocar strings nuevos cuando el
+    # mensaje ya viene normalizado (el caso común: un dígito del menú)
+    message = message.strip()
+    if not (message.isdigit() or message.islower()):
+        message = message.lower()
+
+    # Estado de conversación: se resuelve en memoria, sin tocar la BD
+    conversation_state, conversation_data = conversation_store.get(user_phone_number)
+
+    logger.debug("Estado de conversación: '%s'", conversation_state)
+    logger.debug("Datos de conversación: '%s'", conversation_data)
+
     # Si el usuario está en proceso de solicitar comprobante
-    if hasattr(user, 'conversation_state') and user.conversation_state:
-        response_text = await _handle_receipt_conversation(message, user_phone_number, user, db, display_name)
+    if conversation_state:
+        response_text = await _handle_receipt_conversation(
+            message, user_phone_number, conversation_state, conversation_data, db
+        )
         
         # ENVIAR LA RESPUESTA AUTOMÁTICA A WHATSAPP
         if response_text:
             try:
-                print(f"🤖 Enviando respuesta automática a {user_phone_number}: {response_text}")
-                success = send_whatsapp_message(to=user_phone_number, message=response_text)
-                
+                logger.info("Enviando respuesta automática a %s (len=%d)", user_phone_number, len(response_text))
+                success = await asyncio.to_thread(send_whatsapp_message, to=user_phone_number, message=response_text)
+
                 if success:
-                    print("✅ Respuesta automática enviada exitosamente")
-                    print("✅ Respuesta automática enviada (no registrada en BD)")
+                    # Las respuestas automáticas se envían pero no se registran en BD
+                    logger.info("Respuesta automática enviada exitosamente")
                 else:
-                    print("❌ Error al enviar respuesta automática")
-                    
+                    logger.error("Error al enviar respuesta automática")
+
             except Exception as e:
-                print(f"❌ Error enviando respuesta automática: {e}")
-        
+                logger.error("Error enviando respuesta automática: %s", e)
+
         return response_text
-    
-    # Mapeo de opciones de texto a números
-    option_map = {
-        '1': '1', 'contacto': '1',
-        '2': '2', 'pago': '2', 'comprobante': '2',
-        '3': '3', 'animo': '3', 'ánimo': '3',
-        '4': '4', 'queja': '4', 'denuncia': '4',
-        '5': '5', 'datos': '5',
-        '6': '6', 'suscripcion': '6', 'suscripción': '6',
-    }
+
+    # Buscar el usuario con un solo SELECT; el upsert se pospone hasta
+    # saber si este mensaje realmente amerita escribir en la BD
+    user = _get_user_by_phone(db, user_phone_number)
+
+    # Obtener el nombre de display
+    display_name = user.name if user and user.name else user_name
 
     # Determinar la opción elegida
-    chosen_option = None
-    for keyword, option_number in option_map.items():
-        if keyword in message:
-            chosen_option = option_number
-            break
+    chosen_option = classify_option(message)
 
     # Procesar opciones del menú
     if chosen_option:
-        if chosen_option == '6':  # Cancelar suscripción
-            if user:
-                user.is_active = False
-                db.commit()
-                response_text = "Tu suscripción ha sido cancelada. No recibirás más mensajes de nuestra parte a menos que nos vuelvas a contactar."
-            else:
-                response_text = "No se pudo encontrar tu suscripción para cancelar."
-
-        elif chosen_option == '1':  # Números de contacto
-            response_text = CONTACT_MESSAGE
-        
-        elif chosen_option == '2':  # Comprobante de pago
-            # Iniciar flujo de comprobante de pago
-            if user:
-                user.conversation_state = "waiting_cedula"
-                db.commit()
-            
-            response_text = RECEIPT_INIT_MESSAGE
-        
-        elif chosen_option == '4':  # Realizar una queja o denuncia
-            response_text = (
-                "📢 *Realizar una queja o denuncia*\n\n"
-                f"Hola {display_name}, para realizar una petición, queja, reclamo, sugerencia o denuncia, "
-                "puedes hacerlo a través del formulario PQRS en nuestra página web:\n\n"
-                "🌐 https://www.agrojurado.com/pqrs\n\n"
-                "📧 pqrs@agrojurado.com\n\n"
-                "📞 322 513 7306\n\n"
-
-                "También puedes radicar tu solicitud de forma anónima desde el mismo formulario si así lo prefieres.\n\n"
-                "Todas las solicitudes serán atendidas conforme a nuestros tiempos de respuesta establecidos.\n\n"
-                "_Escribe *Menú* o *Volver* para regresar al menú principal._"
+        # Un solo BEGIN/COMMIT por turno: se reutiliza el usuario ya leído,
+        # el upsert y la mutación del handler (si la hay) viajan juntos
+        if user is None:
+            user = WhatsappUser(
+                phone_number=user_phone_number,
+                name=user_name if user_name else user_phone_number,
+                last_interaction=func.now()
             )
+            db.add(user)
+        else:
+            user.last_interaction = func.now()
+            # Solo actualizar el nombre si el usuario no tiene uno personalizado
+            if user_name and user.name == user.phone_number:
+                user.name = user_name
+        display_name = user.name if user.name else user_name
 
-        elif chosen_option == '5':  # Tratamiento de datos
-            response_text = DATA_TREATMENT_MESSAGE
-
-        elif chosen_option == '3':  # Estado de ánimo
-            response_text = (
-                "😊 *Estado de ánimo*\n\n"
-                f"Hola {display_name}, actualmente esta opción no está disponible.\n\n"
-                "_Escribe *Menú* o *Volver* para regresar al menú principal._"
-            )
-        
+        handler = OPTION_HANDLERS.get(chosen_option)
+        if handler:
+            response_text = handler(db, user, display_name)
         else:
             # Implementación por defecto
             response_text = f"Has elegido la opción {chosen_option}. Próximamente implementaremos esta función."
-    
+        db.commit()
+
     else:
-        # Mostrar menú automáticamente para cualquier mensaje no reconocido
+        # Mostrar menú automáticamente para cualquier mensaje no reconocido,
+        # sin upsert ni commit salvo que sea el primer contacto del usuario
+        if user is None:
+            create_or_update_whatsapp_user(db, user_phone_number, user_name)
         response_text = WELCOME_MESSAGE
 
     # ENVIAR LA RESPUESTA AUTOMÁTICA A WHATSAPP
     if response_text:
         try:
-            print(f"🤖 Enviando respuesta automática a {user_phone_number}: {response_text}")
-            success = send_whatsapp_message(to=user_phone_number, message=response_text)
-            
+            logger.info("Enviando respuesta automática a %s (len=%d)", user_phone_number, len(response_text))
+            success = await asyncio.to_thread(send_whatsapp_message, to=user_phone_number, message=response_text)
+
             if success:
-                print("✅ Respuesta automática enviada exitosamente")
-                
                 # NO GUARDAR mensajes automáticos en la base de datos
                 # Las respuestas automáticas del bot no deben aparecer como mensajes en el chat
                 # Solo se envían a WhatsApp, pero no se registran en la conversación del dashboard
-                print("✅ Respuesta automática enviada (no registrada en BD)")
-                
+                logger.info("Respuesta automática enviada exitosamente")
             else:
-                print("❌ Error al enviar respuesta automática")
-                
+                logger.error("Error al enviar respuesta automática")
+
         except Exception as e:
-            print(f"❌ Error enviando respuesta automática: {e}")
-    
+            logger.error("Error enviando respuesta automática: %s", e)
+
     return response_text
 
-async def _handle_receipt_conversation(message: str, user_phone_number: str, user, db, display_name: str) -> str:
+async def _handle_receipt_conversation(message: str, user_phone_number: str, conversation_state: str,
+                                       conversation_data: Optional[Dict[str, Any]], db) -> str:
     """
-    Maneja la conversación para solicitar comprobante de pago
+    Maneja la conversación para solicitar comprobante de pago.
+    El estado vive en conversation_store; la BD solo se consulta para
+    validar datos y buscar comprobantes
     """
-    
-    print(f"🔍 DEBUG: Procesando conversación para {user_phone_number}")
-    print(f"🔍 DEBUG: Estado de conversación: {user.conversation_state}")
-    print(f"🔍 DEBUG: Mensaje recibido: '{message}'")
-    
-    conversation_state = user.conversation_state
-    
+
+    logger.debug("Procesando conversación para %s", user_phone_number)
+    logger.debug("Estado de conversación: %s", conversation_state)
+    logger.debug("Mensaje recibido: '%s'", message)
+
     # Verificar si el usuario quiere cancelar o volver al menú
-    cancel_keywords = ['cancelar', 'cancel', 'menu', 'menú', 'volver', 'atras', 'atrás', 'salir', '0']
-    message_lower = message.lower().strip()
-    
-    # Solo cancelar si el mensaje completo coincide con una palabra clave
-    if message_lower in cancel_keywords:
+    # (el mensaje ya llega normalizado desde process_message); solo cancelar
+    # si el mensaje completo coincide con una palabra clave
+    if message in _CANCEL_KEYWORDS:
         # Limpiar estado de conversación
-        user.conversation_state = None
-        user.conversation_data = None
-        db.commit()
-        
+        conversation_store.clear(user_phone_number)
+
         return WELCOME_MESSAGE
     
     if conversation_state == "waiting_cedula":
-        print(f"🔍 DEBUG: Validando cédula: '{message}'")
+        logger.debug("Validando cédula: '%s'", message)
         
         # Validar formato de cédula
         is_valid, cedula_message = ValidationService.validate_cedula_format(message)
         
-        print(f"🔍 DEBUG: Validación cédula - Válida: {is_valid}, Mensaje: {cedula_message}")
+        logger.debug("Validación cédula - Válida: %s, Mensaje: %s", is_valid, cedula_message)
         
         if not is_valid:
             response = f"❌ {cedula_message}\n\nPor favor, ingresa tu cédula nuevamente."
-            print(f"🔍 DEBUG: Respuesta de error: {response}")
+            logger.debug("Respuesta de error: %s", response)
             return response
         
         # Verificar si la cédula está registrada en la base de datos
-        is_registered, registration_message, user_data = ValidationService.is_cedula_registered(db, message)
+        # (consulta síncrona: en un hilo para no bloquear el event loop)
+        is_registered, registration_message, user_data = await asyncio.to_thread(
+            ValidationService.is_cedula_registered, db, message
+        )
         
-        print(f"🔍 DEBUG: Verificación registro - Registrada: {is_registered}, Mensaje: {registration_message}")
+        logger.debug("Verificación registro - Registrada: %s, Mensaje: %s", is_registered, registration_message)
         
         if not is_registered:
-            # Mantener el estado para que pueda volver a escribir la cédula
-            user.conversation_state = "waiting_cedula"
-            user.conversation_data = None
-            db.commit()
+            # Mantener el estado (renovando el TTL) para que pueda volver a escribir la cédula
+            conversation_store.set(user_phone_number, "waiting_cedula")
             
-            response = (
-                f"❌ La cédula {message} no existe en nuestros registros.\n\n"
-                f"Por favor, ingresa tu número de cédula nuevamente:"
-            )
-            print(f"🔍 DEBUG: Respuesta de cédula no registrada: {response}")
+            response = CEDULA_NOT_REGISTERED_TEMPLATE.format(cedula=message)
+            logger.debug("Respuesta de cédula no registrada: %s", response)
             return response
         
         # Guardar cédula y cambiar estado
-        conversation_data = {"cedula": message}
-        user.conversation_data = json.dumps(conversation_data)
-        user.conversation_state = "waiting_date"
-        db.commit()
+        conversation_store.set(user_phone_number, "waiting_date", {"cedula": message})
         
-        print(f"🔍 DEBUG: Cédula guardada: {message}, Estado cambiado a: waiting_date")
+        logger.debug("Cédula guardada: %s, Estado cambiado a: waiting_date", message)
         
-        response = (
-            f"¡Hola {user_data.name}! ☺️\n\n"
-            f"para continuar, por favor ingresa la\n"
-            f"*fecha de expedición de tu cédula*.\n\n"
-            f"La fecha debe estar en formato:\n"
-            f"*DD/MM/AAAA*\n\n"
-            f"Ejemplo: *15/03/1990*"
-        )
-        print(f"🔍 DEBUG: Respuesta de éxito: {response}")
+        response = EXPEDITION_DATE_PROMPT_TEMPLATE.format(name=user_data.name)
+        logger.debug("Respuesta de éxito: %s", response)
         return response
     
     elif conversation_state == "waiting_date":
-        print(f"🔍 DEBUG: Validando fecha: '{message}'")
+        logger.debug("Validando fecha: '%s'", message)
         
         # Validar formato de fecha
         is_valid, date_message, date_obj = ValidationService.validate_date_format(message)
         
-        print(f"🔍 DEBUG: Validación fecha - Válida: {is_valid}, Mensaje: {date_message}, Objeto: {date_obj}")
+        logger.debug("Validación fecha - Válida: %s, Mensaje: %s, Objeto: %s", is_valid, date_message, date_obj)
         
         if not is_valid:
             response = f"❌ {date_message}\n\nPor favor, ingresa la fecha nuevamente en formato DD/MM/AAAA."
-            print(f"🔍 DEBUG: Respuesta de error fecha: {response}")
+            logger.debug("Respuesta de error fecha: %s", response)
             return response
         
         # Obtener cédula guardada
-        conversation_data = json.loads(user.conversation_data or "{}")
+        conversation_data = conversation_data or {}
         cedula = conversation_data.get("cedula")
         
         # Validar datos del usuario (cédula + fecha de expedición)
-        print(f"🔍 DEBUG: Validando datos usuario - Cédula: {cedula}, Fecha: {date_obj}")
-        user_valid, user_message, user_data = ValidationService.validate_user_data(db, cedula, date_obj)
+        logger.debug("Validando datos usuario - Cédula: %s, Fecha: %s", cedula, date_obj)
+        user_valid, user_message, user_data = await asyncio.to_thread(
+            ValidationService.validate_user_data, db, cedula, date_obj
+        )
         
-        print(f"🔍 DEBUG: Validación datos usuario - Válida: {user_valid}, Mensaje: {user_message}")
+        logger.debug("Validación datos usuario - Válida: %s, Mensaje: %s", user_valid, user_message)
         
         if not user_valid:
             response = f"❌ {user_message}\n\nPor favor, verifica la fecha de expedición e intenta nuevamente."
-            print(f"🔍 DEBUG: Respuesta de error datos usuario: {response}")
+            logger.debug("Respuesta de error datos usuario: %s", response)
             return response
         
         if not cedula:
             # Error en los datos guardados, reiniciar
-            user.conversation_state = None
-            user.conversation_data = None
-            db.commit()
-            return "❌ Error en el proceso. Por favor, inicia nuevamente seleccionando 'Mi comprobante de pago'."
+            conversation_store.clear(user_phone_number)
+            return RECEIPT_PROCESS_ERROR_MESSAGE
         
         # Buscar y enviar los últimos dos comprobantes
-        success, result_message = ReceiptService.search_and_send_receipt(
+        success, result_message = await asyncio.to_thread(
+            ReceiptService.search_and_send_receipt,
             db=db,
             cedula=cedula,
             expedition_date_str=message,
@@ -328,20 +405,15 @@ async def _handle_receipt_conversation(message: str, user_phone_number: str, use
         # Verificar si necesitamos mostrar opciones de comprobantes
         if success and "options_sent" in result_message:
             # Guardar los comprobantes encontrados para la selección
-            conversation_data = json.loads(user.conversation_data or "{}")
             conversation_data["receipts_found"] = True
-            user.conversation_data = json.dumps(conversation_data)
-            user.conversation_state = "waiting_receipt_selection"
-            db.commit()
+            conversation_store.set(user_phone_number, "waiting_receipt_selection", conversation_data)
             
             # No retornar mensaje adicional, solo las opciones ya fueron enviadas
             return ""
         else:
             # Limpiar estado de conversación
-            user.conversation_state = None
-            user.conversation_data = None
-            db.commit()
-            
+            conversation_store.clear(user_phone_number)
+
             if success:
                 return (
                     f"✅ {result_message}\n\n"
@@ -359,31 +431,27 @@ async def _handle_receipt_conversation(message: str, user_phone_number: str, use
         # Procesar selección de comprobante
         if message in ['1', '2']:
             # Obtener los comprobantes disponibles
-            conversation_data = json.loads(user.conversation_data or "{}")
+            conversation_data = conversation_data or {}
             cedula = conversation_data.get("cedula")
             
             if not cedula:
                 # Error en los datos guardados, reiniciar
-                user.conversation_state = None
-                user.conversation_data = None
-                db.commit()
-                return "❌ Error en el proceso. Por favor, inicia nuevamente seleccionando 'Mi comprobante de pago'."
+                conversation_store.clear(user_phone_number)
+                return RECEIPT_PROCESS_ERROR_MESSAGE
             
             # OPTIMIZACIÓN: Buscar directamente en la carpeta seleccionada
             folder_name = "recientes" if message == '2' else "anteriores"
             
             # Buscar comprobantes solo en la carpeta específica
-            success, message_receipts, receipts = ReceiptService.get_receipts_by_folder(
-                db=db,
+            success, message_receipts, receipts = await asyncio.to_thread(
+                ReceiptService.get_receipts_by_folder,
                 cedula=cedula,
                 folder=folder_name
             )
             
             if not success:
-                user.conversation_state = None
-                user.conversation_data = None
-                db.commit()
-                
+                conversation_store.clear(user_phone_number)
+
                 # Mensaje específico según la carpeta
                 if message == '2':  # Quincena actual
                     return (
@@ -403,13 +471,11 @@ async def _handle_receipt_conversation(message: str, user_phone_number: str, use
             file_name = selected_receipt['file_name']
             file_path = selected_receipt['file_path']
             
-            success, result_message = ReceiptService.send_selected_receipt(selected_receipt, user_phone_number)
+            success, result_message = await asyncio.to_thread(ReceiptService.send_selected_receipt, selected_receipt, user_phone_number)
             
             # Limpiar estado de conversación
-            user.conversation_state = None
-            user.conversation_data = None
-            db.commit()
-            
+            conversation_store.clear(user_phone_number)
+
             if success:
                 return (
                     f"✅ {result_message}\n\n"
@@ -424,14 +490,12 @@ async def _handle_receipt_conversation(message: str, user_phone_number: str, use
                     f"{MENU_RETURN_MESSAGE}"
                 )
         else:
-            return "❌ Por favor, responde con '1' para la quincena anterior o '2' para la quincena reciente."
+            return RECEIPT_SELECTION_PROMPT
     
     else:
         # Estado desconocido, reiniciar
-        user.conversation_state = None
-        user.conversation_data = None
-        db.commit()
-        return "❌ Error en el proceso. Por favor, inicia nuevamente seleccionando 'Mi comprobante de pago'."
+        conversation_store.clear(user_phone_number)
+        return RECEIPT_PROCESS_ERROR_MESSAGE
 
 def send_message_to_user(db: Session, phone_number: str, message: str, current_user: dict = None) -> Tuple[bool, Optional[Message], str]:
     """
@@ -439,29 +503,84 @@ def send_message_to_user(db: Session, phone_number: str, message: str, current_u
     Retorna: (éxito, objeto_mensaje, mensaje_error)
     """
     try:
-        # Enviar mensaje a WhatsApp
-        result = send_whatsapp_message(to=phone_number, message=message)
+        # Enviar mensaje a WhatsApp (variante que retorna el payload de la
+        # API: el bool de send_whatsapp_message no trae el id del mensaje)
+        result = send_whatsapp_message_with_response(to=phone_number, message=message)
         
         if not result:
             return False, None, "Error al enviar mensaje a WhatsApp"
+        
+        message_id = result.get('messages', [{}])[0].get('id')
+        if not message_id:
+            return False, None, "La API de WhatsApp no devolvió el id del mensaje"
             
-        # Guardar mensaje en la base de datos
+        # Guardar mensaje en la base de datos con un solo INSERT (sin refresh):
+        # el id lo asigna la API de WhatsApp y el timestamp se genera aquí,
+        # así no hace falta el SELECT extra para re-leer la fila
         new_message = Message(
+            id=message_id,
             phone_number=phone_number,
             content=message,
             sender="bot",
-            message_id=result.get('messages', [{}])[0].get('id', None)
+            timestamp=datetime.now()
         )
-        
-        db.add(new_message)
+
+        db.execute(insert(Message).values(
+            id=new_message.id,
+            phone_number=new_message.phone_number,
+            content=new_message.content,
+            sender=new_message.sender,
+            timestamp=new_message.timestamp
+        ))
         db.commit()
-        db.refresh(new_message)
-        
+
         return True, new_message, "Mensaje enviado correctamente"
         
     except Exception as e:
         return False, None, f"Error al enviar mensaje: {str(e)}"
 
+async def send_messages_to_users(db: Session, phone_numbers: List[str], message: str) -> Dict[str, Any]:
+    """
+    Envía el mismo mensaje a varios usuarios de forma concurrente.
+
+    Los envíos a WhatsApp se lanzan en paralelo con asyncio.gather (cada uno
+    en un hilo, la API síncrona usa requests) y las filas de los envíos
+    exitosos se guardan con un solo INSERT executemany y un único commit,
+    en lugar de un viaje HTTP + transacción por destinatario.
+    Retorna: {"sent": [...], "failed": [...]}
+    """
+    results = await asyncio.gather(
+        *(asyncio.to_thread(send_whatsapp_message_with_response, to=phone, message=message) for phone in phone_numbers),
+        return_exceptions=True
+    )
+
+    timestamp = datetime.now()
+    rows = []
+    sent, failed = [], []
+    for phone, result in zip(phone_numbers, results):
+        if isinstance(result, Exception) or not result:
+            failed.append(phone)
+            continue
+        # El id es la clave primaria del mensaje: sin él no hay fila que insertar
+        message_id = result.get('messages', [{}])[0].get('id')
+        if not message_id:
+            failed.append(phone)
+            continue
+        sent.append(phone)
+        rows.append({
+            "id": message_id,
+            "phone_number": phone,
+            "content": message,
+            "sender": "bot",
+            "timestamp": timestamp,
+        })
+
+    if rows:
+        db.execute(insert(Message), rows)
+        db.commit()
+
+    return {"sent": sent, "failed": failed}
+
 def handle_webhook_message(message_data: Dict[str, Any], db: Session) -> Dict[str, Any]:
     """
     Procesa un mensaje entrante desde el webhook de WhatsApp
@@ -482,7 +601,7 @@ def handle_webhook_message(message_data: Dict[str, Any], db: Session) -> Dict[st
         if interactive_data.get("type") == "button_reply":
             button_reply = interactive_data.get("button_reply", {})
             message_text = button_reply.get("id", "")  # El ID del botón presionado
-            print(f"🔘 Botón presionado: ID='{message_text}', Título='{button_reply.get('title', '')}'")
+            logger.debug("Botón presionado: ID='%s', Título='%s'", message_text, button_reply.get('title', ''))
     
     if not message_text:
         return {"success": False, "reason": "Tipo de mensaje no soportado o sin texto"}
@@ -494,12 +613,21 @@ def handle_webhook_message(message_data: Dict[str, Any], db: Session) -> Dict[st
         id=message_id,
         phone_number=from_number,
         content=message_text,
-        sender="user"
+        sender="user",
+        timestamp=datetime.now()
     )
-    
-    db.add(user_message)
-    db.commit()
-    db.refresh(user_message)
+
+    # INSERT por Core, sin pasar por la maquinaria de unit-of-work del ORM:
+    # todos los valores son conocidos en el cliente, así que no hace falta
+    # RETURNING ni refresh (MySQL tampoco soporta RETURNING). El COMMIT lo
+    # emite el llamador al terminar de procesar el evento
+    db.execute(insert(Message).values(
+        id=user_message.id,
+        phone_number=user_message.phone_number,
+        content=user_message.content,
+        sender=user_message.sender,
+        timestamp=user_message.timestamp
+    ))
     
     return {
         "success": True,
@@ -1,12 +1,26 @@
+import atexit
+import io
 import os
+import queue
+import socket
+import sys
+import time
+from functools import lru_cache
 from ftplib import FTP, error_perm
 from typing import Optional, Tuple, List, Dict
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 from datetime import datetime, timedelta
+from cachetools import TTLCache
+from collections import defaultdict
+import logging
+import re
 import threading
 
 
+logger = logging.getLogger(__name__)
+
 FTP_HOST = os.getenv("FTP_HOST")
 FTP_USER = os.getenv("FTP_USER")
 FTP_PASSWORD = os.getenv("FTP_PASSWORD")
@@ -14,9 +28,25 @@ FTP_BASE_DIR = os.getenv("FTP_BASE_DIR")
 FTP_PUBLIC_BASE_URL = os.getenv("FTP_PUBLIC_BASE_URL", "")
 
 # Cache para metadatos de archivos (optimización de rendimiento)
-_file_metadata_cache: Dict[str, Dict] = {}
-_cache_lock = threading.Lock()
 CACHE_DURATION_MINUTES = 5  # Cache válido por 5 minutos
+# TTLCache expira las entradas de forma perezosa al leer, sin comprobación
+# manual de timestamps bajo el lock
+_file_metadata_cache: TTLCache = TTLCache(maxsize=128, ttl=CACHE_DURATION_MINUTES * 60)
+# Caché de listados NLST por subcarpeta: en hit se evita la conexión FTP
+# completa (LIST tarda ~1-3 s); comparte TTL e invalidación con el de metadatos
+_listing_cache: TTLCache = TTLCache(maxsize=128, ttl=CACHE_DURATION_MINUTES * 60)
+# Índice invertido cédula -> archivos, derivado del caché de metadatos:
+# convierte la búsqueda por cédula de un escaneo O(N) a un acceso O(1)
+_cedula_index_cache: TTLCache = TTLCache(maxsize=128, ttl=CACHE_DURATION_MINUTES * 60)
+# Las cédulas aparecen en los nombres como corridas de 6 a 12 dígitos
+_CEDULA_RE = re.compile(r'\d{6,12}')
+
+# Mapeo de meses de los listados LIST (solo lo usa el fallback sin MLSD)
+_MONTH_MAP = {
+    'Jan': 1, 'Feb': 2, 'Mar': 3, 'Apr': 4, 'May': 5, 'Jun': 6,
+    'Jul': 7, 'Aug': 8, 'Sep': 9, 'Oct': 10, 'Nov': 11, 'Dec': 12
+}
+_cache_lock = threading.RLock()
 
 
 # =====================================================
@@ -28,6 +58,9 @@ def _validate_ftp_credentials() -> bool:
     return all([FTP_HOST, FTP_USER, FTP_PASSWORD])
 
 
+# Los subdirectorios son un conjunto pequeño y fijo ('recientes',
+# 'anteriores'), así que la ruta se memoiza y el rstrip/strip se paga una vez
+@lru_cache(maxsize=32)
 def _build_remote_path(subdir: str) -> str:
     """Construye la ruta remota completa para un subdirectorio."""
     if FTP_BASE_DIR:
@@ -35,15 +68,24 @@ def _build_remote_path(subdir: str) -> str:
     return subdir.strip('/')
 
 
+_SKIP_ENTRIES = frozenset(('.', '..'))
+
+# Sufijos PDF aceptados: probar la tupla evita alocar un string nuevo con
+# .lower() por cada archivo del listado
+_PDF_SUFFIXES = ('.pdf', '.PDF', '.Pdf')
+
+
 def _filter_valid_files(files: List[str]) -> List[str]:
     """Filtra y devuelve solo nombres de archivos válidos (no carpetas)."""
-    result = []
-    for f in files:
-        if f and not f.endswith('/') and f not in ['.', '..']:
-            filename = os.path.basename(f)
-            if filename not in ['.', '..']:
-                result.append(filename)
-    return result
+    # rsplit en vez de os.path.basename: misma semántica para rutas FTP,
+    # sin normalización extra; el frozenset evita listas temporales
+    return [
+        filename
+        for f in files
+        if f and not f.endswith('/') and f not in _SKIP_ENTRIES
+        for filename in (f.rsplit('/', 1)[-1],)
+        if filename not in _SKIP_ENTRIES
+    ]
 
 
 def _format_file_size(size_bytes: int) -> str:
@@ -60,57 +102,243 @@ def _format_file_size(size_bytes: int) -> str:
     return f"{size_bytes:.1f} {size_names[i]}"
 
 
+# Bloques de 64 KB en las transferencias: el blocksize por defecto de
+# ftplib (8 KB) multiplica los syscalls por MB transferido
+TRANSFER_BLOCKSIZE = 64 * 1024
+
+
+class _TunedFTP(FTP):
+    """FTP con sockets afinados para transferencias de PDFs de varios MB."""
+
+    @staticmethod
+    def _tune_socket(sock) -> None:
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1 << 20)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+        except OSError:
+            # Opciones no soportadas por la plataforma: no es fatal
+            pass
+
+    def connect(self, *args, **kwargs):
+        ret = super().connect(*args, **kwargs)
+        self._tune_socket(self.sock)
+        return ret
+
+    def ntransfercmd(self, cmd, rest=None):
+        # Aplicar el mismo afinado al socket de datos de cada transferencia
+        conn, size = super().ntransfercmd(cmd, rest)
+        self._tune_socket(conn)
+        return conn, size
+
+
+# Pool de conexiones FTP: cada operación pagaba handshake TCP + AUTH;
+# reutilizar sesiones autenticadas deja ese coste solo en el primer uso
+FTP_POOL_SIZE = 6            # Conexiones ociosas máximas retenidas
+FTP_POOL_IDLE_SECONDS = 30   # Una conexión ociosa más vieja se descarta
+FTP_MAX_REUSE = 100          # Renovar la sesión tras este número de usos
+
+
+class _FTPPool:
+    """Pool LIFO y thread-safe de conexiones FTP autenticadas."""
+
+    def __init__(self, maxsize: int = FTP_POOL_SIZE):
+        self._idle: queue.LifoQueue = queue.LifoQueue(maxsize=maxsize)
+
+    def _connect(self) -> FTP:
+        ftp = _TunedFTP(timeout=30)  # Timeout de 30 segundos
+        ftp.connect(FTP_HOST, 21)  # Puerto FTP estándar
+        ftp.login(FTP_USER, FTP_PASSWORD)
+        ftp._pool_reuse_count = 0
+        ftp._pool_home = ftp.pwd()
+        return ftp
+
+    def acquire(self) -> FTP:
+        """Toma una conexión viva del pool o abre una nueva si no hay."""
+        while True:
+            try:
+                ftp, returned_at = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+
+            # Descartar conexiones ociosas viejas o muertas
+            if time.monotonic() - returned_at > FTP_POOL_IDLE_SECONDS:
+                self.discard(ftp)
+                continue
+            try:
+                ftp.voidcmd('NOOP')  # Health check
+                return ftp
+            except Exception:
+                self.discard(ftp)
+
+    def release(self, ftp: FTP) -> None:
+        """Devuelve una conexión al pool (o la cierra si ya no es reutilizable)."""
+        ftp._pool_reuse_count = getattr(ftp, '_pool_reuse_count', 0) + 1
+        if ftp._pool_reuse_count >= FTP_MAX_REUSE:
+            self.discard(ftp)
+            return
+        try:
+            # Restaurar el directorio inicial: las operaciones pueden haber
+            # hecho cwd y el siguiente usuario asume la sesión limpia
+            ftp.cwd(ftp._pool_home)
+        except Exception:
+            self.discard(ftp)
+            return
+        try:
+            self._idle.put_nowait((ftp, time.monotonic()))
+        except queue.Full:
+            self.discard(ftp)
+
+    @staticmethod
+    def discard(ftp: FTP) -> None:
+        """Cierra una conexión que no vuelve al pool."""
+        try:
+            ftp.quit()
+        except Exception:
+            try:
+                ftp.close()
+            except Exception:
+                pass
+
+    def close_all(self) -> None:
+        """Cierra las conexiones ociosas; se usa al apagar el proceso."""
+        while True:
+            try:
+                ftp, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self.discard(ftp)
+
+
+_ftp_pool = _FTPPool()
+atexit.register(_ftp_pool.close_all)
+
+# Reintentos con backoff y cortacircuitos para la conexión FTP: un blip de
+# red transitorio se recupera en segundos y, si el servidor está caído, los
+# llamadores fallan rápido en vez de apilar hilos esperando el timeout
+CONNECT_RETRIES = 3
+CONNECT_BACKOFF_SECONDS = 0.5
+BREAKER_THRESHOLD = 5        # Fallos consecutivos que abren el circuito
+BREAKER_OPEN_SECONDS = 10    # Tiempo que el circuito permanece abierto
+
+_breaker = {'fails': 0, 'open_until': 0.0}
+_breaker_lock = threading.Lock()
+
+
 @contextmanager
 def ftp_connection():
     """
     Context manager para manejar conexiones FTP de forma segura.
-    
+
+    Toma la conexión del pool y la devuelve al terminar; si la operación
+    falla, la conexión se descarta porque su estado ya no es confiable.
+
     Yields:
         FTP: Conexión FTP autenticada
-        
+
     Raises:
         ConnectionError: Si no se pueden validar las credenciales o conectar
     """
     if not _validate_ftp_credentials():
         raise ConnectionError("Faltan credenciales FTP requeridas")
-    
+
+    with _breaker_lock:
+        if time.monotonic() < _breaker['open_until']:
+            raise ConnectionError(f"Servidor FTP {FTP_HOST} marcado como caído; se reintentará en unos segundos")
+
     ftp = None
-    try:
-        ftp = FTP(timeout=30)  # Timeout de 30 segundos
-        ftp.connect(FTP_HOST, 21)  # Puerto FTP estándar
-        ftp.login(FTP_USER, FTP_PASSWORD)
-        yield ftp
-    except OSError as e:
+    last_error = None
+    for attempt in range(CONNECT_RETRIES):
+        try:
+            ftp = _ftp_pool.acquire()
+            break
+        except OSError as e:
+            last_error = e
+            if attempt < CONNECT_RETRIES - 1:
+                time.sleep(CONNECT_BACKOFF_SECONDS * (2 ** attempt))
+        except Exception as e:
+            raise ConnectionError(f"Error conectando a FTP: {e}")
+
+    if ftp is None:
+        with _breaker_lock:
+            _breaker['fails'] += 1
+            if _breaker['fails'] >= BREAKER_THRESHOLD:
+                _breaker['open_until'] = time.monotonic() + BREAKER_OPEN_SECONDS
+        e = last_error
         if "Network is unreachable" in str(e):
             raise ConnectionError(f"No se puede alcanzar el servidor FTP {FTP_HOST}. Verifique la configuración de DNS/red.")
         elif "Connection refused" in str(e):
             raise ConnectionError(f"Conexión rechazada por el servidor FTP {FTP_HOST}. Verifique que el servicio FTP esté funcionando.")
         else:
             raise ConnectionError(f"Error de red conectando a FTP: {e}")
-    except Exception as e:
-        raise ConnectionError(f"Error conectando a FTP: {e}")
-    finally:
-        if ftp:
-            try:
-                ftp.quit()
-            except Exception:
-                try:
-                    ftp.close()
-                except Exception:
-                    pass
+
+    with _breaker_lock:
+        _breaker['fails'] = 0
+
+    try:
+        yield ftp
+    except Exception:
+        _FTPPool.discard(ftp)
+        raise
+    else:
+        _ftp_pool.release(ftp)
+
+
+# Directorios ya verificados/creados en este proceso: evita repetir los MKD
+# (rechazados con 550 uno por segmento) en cada subida o movimiento
+_known_dirs: set = set()
+_known_dirs_lock = threading.Lock()
 
 
 def _ensure_dirs(ftp: FTP, remote_dir: str) -> None:
-    parts = [p for p in remote_dir.split('/') if p]
-    current = ''
-    for part in parts:
-        current += '/' + part
+    with _known_dirs_lock:
+        if remote_dir in _known_dirs:
+            return
+
+    # Sondear primero la ruta completa: en el caso común (la carpeta ya
+    # existe) un solo CWD reemplaza un round-trip por segmento. Las rutas
+    # de escritura usan STOR/RENAME con rutas absolutas, así que cambiar
+    # el directorio de trabajo aquí no afecta al resto de la sesión.
+    try:
+        ftp.cwd(remote_dir)
+    except error_perm:
+        parts = [p for p in remote_dir.split('/') if p]
+        current = ''
+        for part in parts:
+            current += '/' + part
+            try:
+                ftp.cwd(current)
+            except error_perm:
+                ftp.mkd(current)
+
+    with _known_dirs_lock:
+        _known_dirs.add(remote_dir)
+
+
+def _store_file(ftp: FTP, remote_path: str, f) -> None:
+    """
+    Sube un archivo ya abierto al servidor FTP.
+
+    En Linux los bytes van directo del archivo al socket de datos con
+    os.sendfile (cero copias por espacio de usuario); en otras plataformas
+    se usa storbinary con el blocksize afinado.
+    """
+    if sys.platform == 'linux':
+        # transfercmd no fija el modo binario (storbinary sí lo hace por
+        # dentro): sin esto la primera subida de una conexión nueva iría en
+        # ASCII y el servidor podría corromper los PDF al traducir saltos
+        ftp.voidcmd('TYPE I')
+        conn = ftp.transfercmd(f'STOR {remote_path}')
         try:
-            ftp.mkd(current)
-        except error_perm as e:
-            # 550 means already exists; ignore other errors
-            if not str(e).startswith('550'):
-                raise
+            size = os.fstat(f.fileno()).st_size
+            sent = 0
+            while sent < size:
+                sent += os.sendfile(conn.fileno(), f.fileno(), sent, size - sent)
+        finally:
+            conn.close()
+        ftp.voidresp()
+    else:
+        ftp.storbinary(f'STOR {remote_path}', f, blocksize=TRANSFER_BLOCKSIZE)
 
 
 def upload_file(local_path: str, remote_subdir: str, filename: str) -> Tuple[Optional[str], Optional[str]]:
@@ -128,25 +356,25 @@ def upload_file(local_path: str, remote_subdir: str, filename: str) -> Tuple[Opt
     try:
         # Validar que el archivo local existe
         if not os.path.exists(local_path):
-            print(f"❌ ERROR: Archivo local no existe: {local_path}")
+            logger.error("Archivo local no existe: %s", local_path)
             return None, None
         
         # Validar credenciales FTP
         if not _validate_ftp_credentials():
-            print(f"❌ ERROR: Credenciales FTP no configuradas correctamente")
+            logger.error("Credenciales FTP no configuradas correctamente")
             return None, None
         
         # Construir ruta remota usando helper
         remote_dir = _build_remote_path(remote_subdir)
         remote_path = f"{remote_dir}/{filename}"
         
-        print(f"🔍 DEBUG: Subiendo {local_path} -> {remote_path}")
+        logger.debug("Subiendo %s -> %s", local_path, remote_path)
 
         with ftp_connection() as ftp:
             _ensure_dirs(ftp, remote_dir)
             with open(local_path, 'rb') as f:
-                ftp.storbinary(f'STOR {remote_path}', f)
-                print(f"✅ DEBUG: Archivo {filename} subido exitosamente a {remote_path}")
+                _store_file(ftp, remote_path, f)
+                logger.debug("Archivo %s subido exitosamente a %s", filename, remote_path)
 
         # Construir URL pública si está configurada
         public_url = None
@@ -156,44 +384,132 @@ def upload_file(local_path: str, remote_subdir: str, filename: str) -> Tuple[Opt
         return public_url, remote_path
         
     except ConnectionError as e:
-        print(f"❌ ERROR CONEXIÓN FTP: {e}")
+        logger.error("Error de conexión FTP: %s", e)
         return None, None
     except FileNotFoundError as e:
-        print(f"❌ ERROR ARCHIVO NO ENCONTRADO: {e}")
+        logger.error("Archivo no encontrado: %s", e)
         return None, None
     except PermissionError as e:
-        print(f"❌ ERROR PERMISOS: {e}")
+        logger.error("Error de permisos FTP: %s", e)
         return None, None
     except Exception as e:
-        print(f"❌ ERROR INESPERADO subiendo {filename}: {type(e).__name__}: {e}")
+        logger.error("Error inesperado subiendo %s: %s: %s", filename, type(e).__name__, e)
         return None, None
 
 
+def download_to_bytes(remote_path: str) -> Optional[bytes]:
+    """
+    Descarga un archivo del FTP directamente a memoria.
+
+    Los comprobantes son PDFs pequeños: para quien solo necesita los bytes,
+    pasar por el sistema de archivos (mkstemp + write + fsync) es IOPS
+    desperdiciado.
+    """
+    try:
+        buf = io.BytesIO()
+        with ftp_connection() as ftp:
+            ftp.retrbinary(f"RETR {remote_path}", buf.write, blocksize=TRANSFER_BLOCKSIZE)
+        return buf.getvalue()
+    except Exception:
+        return None
+
+
 def download_to_temp(remote_path: str) -> Optional[str]:
     """
     Descarga un archivo del FTP a un archivo temporal y devuelve su ruta.
     remote_path debe ser absoluto (por ejemplo: /public_html/receipts/recientes/0001_123.pdf)
+
+    Wrapper sobre download_to_bytes para los llamadores que necesitan una
+    ruta en disco (p. ej. subir el PDF a la API de WhatsApp).
     """
+    data = download_to_bytes(remote_path)
+    if data is None:
+        return None
+
+    temp_path = None
     try:
-        with ftp_connection() as ftp:
-            # Crear archivo temporal
-            suffix = os.path.splitext(remote_path)[1] or ".bin"
-            fd, temp_path = tempfile.mkstemp(suffix=suffix)
-            os.close(fd)
-
-            with open(temp_path, 'wb') as f:
-                ftp.retrbinary(f"RETR {remote_path}", f.write)
-            return temp_path
-            
+        suffix = os.path.splitext(remote_path)[1] or ".bin"
+        fd, temp_path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        return temp_path
     except Exception:
         try:
-            if 'temp_path' in locals() and os.path.exists(temp_path):
+            if temp_path and os.path.exists(temp_path):
                 os.remove(temp_path)
         except Exception:
             pass
         return None
 
 
+def _build_cedula_index(files_with_metadata: List[dict]) -> Dict[str, List[dict]]:
+    """Construye el índice cédula -> archivos a partir de un listado con metadatos."""
+    index = defaultdict(list)
+    for file_info in files_with_metadata:
+        for run in _CEDULA_RE.findall(file_info["filename"]):
+            index[run].append(file_info)
+    return dict(index)
+
+
+def _get_cedula_index(subdir: str) -> Dict[str, List[dict]]:
+    """Devuelve el índice invertido de la subcarpeta, construyéndolo si expiró."""
+    cache_key = f"metadata_{subdir}"
+    with _cache_lock:
+        index = _cedula_index_cache.get(cache_key)
+    if index is not None:
+        return index
+
+    files_with_metadata = _get_files_with_metadata(subdir)
+    index = _build_cedula_index(files_with_metadata)
+    with _cache_lock:
+        _cedula_index_cache[cache_key] = index
+    return index
+
+
+def _get_directory_listing(remote_subdir: str, use_cache: bool = True) -> List[str]:
+    """
+    Obtiene los nombres de archivo de una subcarpeta FTP con caché TTL.
+    
+    En hit de caché no se abre conexión FTP; en miss se hace un único NLST
+    y el resultado queda disponible para las siguientes búsquedas durante
+    CACHE_DURATION_MINUTES.
+    """
+    cache_key = f"listing_{remote_subdir}"
+
+    if use_cache:
+        with _cache_lock:
+            cached_files = _listing_cache.get(cache_key)
+        if cached_files is not None:
+            return cached_files
+
+    remote_dir = _build_remote_path(remote_subdir)
+
+    with ftp_connection() as ftp:
+        # No se llama a _ensure_dirs aquí: crear directorios es cosa de las
+        # rutas de escritura; en lectura un directorio ausente es simplemente
+        # un listado vacío (550) y los MKD sobraban en cada búsqueda
+        try:
+            all_files = ftp.nlst(remote_dir)
+        except error_perm as e:
+            if str(e).startswith('550'):
+                all_files = []
+            else:
+                raise ConnectionError(f"Error al acceder al directorio FTP: {e}")
+
+    filenames = []
+    for file_path in all_files:
+        filename = os.path.basename(file_path)
+        if not filename or filename in ['.', '..'] or filename.endswith('/'):
+            continue
+        filenames.append(filename)
+
+    if use_cache:
+        with _cache_lock:
+            _listing_cache[cache_key] = filenames
+
+    return filenames
+
+
 def find_files_by_cedula(remote_subdir: str, cedula: str, with_metadata: bool = False) -> List:
     """
     Busca archivos PDF que contengan una cédula específica en su nombre.
@@ -226,74 +542,64 @@ def find_files_by_cedula(remote_subdir: str, cedula: str, with_metadata: bool =
     if not remote_subdir or not isinstance(remote_subdir, str):
         raise ValueError("El subdirectorio debe ser una cadena no vacía")
     
-    # Si se solicitan metadatos, usar la función optimizada
+    # Si se solicitan metadatos, resolver por el índice invertido: O(1)
+    # en vez de un escaneo por subcadena sobre todo el listado
     if with_metadata:
-        files_with_metadata = _get_files_with_metadata(remote_subdir)
-        matching_files = []
-        for file_info in files_with_metadata:
-            if cedula in file_info["filename"]:
-                matching_files.append(file_info)
-        return matching_files
-    
-    # Comportamiento original para compatibilidad
-    remote_dir = _build_remote_path(remote_subdir)
+        return list(_get_cedula_index(remote_subdir).get(cedula, []))
     
+    # Si el caché de metadatos ya tiene la carpeta fresca (lo pueblan los
+    # listados del panel), se resuelve por el índice sin tocar la red
+    with _cache_lock:
+        cached_index = _cedula_index_cache.get(f"metadata_{remote_subdir}")
+    if cached_index is not None:
+        matching_files = [file_info["filename"] for file_info in cached_index.get(cedula, [])]
+        matching_files.sort()
+        return matching_files
+
+    # Comportamiento original para compatibilidad: el listado completo se
+    # obtiene del caché (o de un NLST si expiró) y se filtra localmente
     try:
-        with ftp_connection() as ftp:
-            # Asegurar que el directorio existe
-            _ensure_dirs(ftp, remote_dir)
-            
-            # OPTIMIZACIÓN: Intentar búsqueda directa con patrón
-            try:
-                # Intentar usar NLST con patrón para búsqueda más eficiente
-                search_pattern = f"{remote_dir}/*{cedula}*.pdf"
-                matching_files = ftp.nlst(search_pattern)
-                
-                # Si encontramos archivos, procesarlos
-                if matching_files:
-                    result = []
-                    for file_path in matching_files:
-                        filename = os.path.basename(file_path)
-                        if filename and not filename.endswith('/'):
-                            result.append(filename)
-                    
-                    if result:
-                        result.sort()
-                        return result
-                
-            except error_perm:
-                # Si falla la búsqueda con patrón, usar método tradicional
-                pass
-            
-            # FALLBACK: Método tradicional (más lento pero garantizado)
-            try:
-                all_files = ftp.nlst(remote_dir)
-            except error_perm as e:
-                if str(e).startswith('550'):
-                    return []
-                raise ConnectionError(f"Error al acceder al directorio FTP: {e}")
-            
-            # Filtrar archivos que contengan la cédula
-            matching_files = []
-            for file_path in all_files:
-                filename = os.path.basename(file_path)
-                
-                # Validar que es un archivo válido
-                if not filename or filename in ['.', '..'] or filename.endswith('/'):
-                    continue
-                
-                # Verificar que es un PDF y contiene la cédula
-                if filename.lower().endswith('.pdf') and cedula in filename:
-                    matching_files.append(filename)
-            
-            # Ordenar por nombre para consistencia
-            matching_files.sort()
-            return matching_files
-        
+        all_filenames = _get_directory_listing(remote_subdir)
+
+        # Filtrar archivos PDF que contengan la cédula
+        matching_files = [
+            filename for filename in all_filenames
+            if filename.endswith(_PDF_SUFFIXES) and cedula in filename
+        ]
+
+        # Ordenar por nombre para consistencia
+        matching_files.sort()
+        return matching_files
+
+    except ConnectionError:
+        raise
     except Exception as e:
         raise ConnectionError(f"Error durante la búsqueda FTP: {str(e)}")
 
 
+def find_files_by_cedula_multi(remote_subdirs: List[str], cedula: str) -> Dict[str, List[str]]:
+    """
+    Busca una cédula en varias subcarpetas y devuelve {subcarpeta: archivos}.
+
+    Una carpeta inaccesible se reporta como lista vacía en vez de abortar
+    la búsqueda completa. Las carpetas frías se resuelven en paralelo (una
+    conexión del pool por worker); en caché caliente no se toca la red.
+    No se usa NLST con comodines del lado del servidor: es una extensión
+    no estándar y saltaría las cachés de listados e índice por cédula.
+    """
+    def _search(subdir: str) -> List[str]:
+        try:
+            return find_files_by_cedula(subdir, cedula)
+        except (ValueError, ConnectionError) as e:
+            logger.debug("Búsqueda de cédula en %s falló: %s", subdir, e)
+            return []
+
+    if len(remote_subdirs) <= 1:
+        return {subdir: _search(subdir) for subdir in remote_subdirs}
+
+    with ThreadPoolExecutor(max_workers=min(len(remote_subdirs), FTP_POOL_SIZE)) as ex:
+        results = list(ex.map(_search, remote_subdirs))
+    return dict(zip(remote_subdirs, results))
 
 
 
@@ -319,7 +625,7 @@ def rename_file(remote_subdir: str, old_name: str, new_name: str) -> bool:
 def move_file(old_subdir: str, new_subdir: str, filename: str) -> Optional[str]:
     """Mueve un archivo entre subcarpetas. Devuelve la nueva ruta completa si tuvo éxito."""
     try:
-        print(f"🔍 DEBUG: Intentando mover {filename} de {old_subdir} a {new_subdir}")
+        logger.debug("Intentando mover %s de %s a %s", filename, old_subdir, new_subdir)
         
         # Construir rutas remotas usando helper
         src_dir = _build_remote_path(old_subdir)
@@ -328,28 +634,28 @@ def move_file(old_subdir: str, new_subdir: str, filename: str) -> Optional[str]:
         src = f"{src_dir}/{filename}"
         dst = f"{dst_dir}/{filename}"
         
-        print(f"🔍 DEBUG: Rutas - Origen: {src}, Destino: {dst}")
+        logger.debug("Rutas - Origen: %s, Destino: %s", src, dst)
         
         with ftp_connection() as ftp:
-            print(f"🔍 DEBUG: Conexión FTP establecida")
+            logger.debug("Conexión FTP establecida")
             
             # Verificar que el archivo origen existe
             try:
                 ftp.size(src)
-                print(f"🔍 DEBUG: Archivo origen existe: {src}")
+                logger.debug("Archivo origen existe: %s", src)
             except Exception as e:
-                print(f"❌ DEBUG: Archivo origen no existe: {src} - Error: {e}")
+                logger.debug("Archivo origen no existe: %s - Error: %s", src, e)
                 return None
             
             _ensure_dirs(ftp, dst_dir)
-            print(f"🔍 DEBUG: Directorio destino asegurado: {dst_dir}")
+            logger.debug("Directorio destino asegurado: %s", dst_dir)
             
             ftp.rename(src, dst)
-            print(f"✅ DEBUG: Archivo renombrado exitosamente: {src} -> {dst}")
+            logger.debug("Archivo renombrado exitosamente: %s -> %s", src, dst)
             return dst
             
     except Exception as e:
-        print(f"❌ DEBUG: Error moviendo archivo {filename}: {e}")
+        logger.error("Error moviendo archivo %s: %s", filename, e)
         return None
 
 
@@ -408,7 +714,7 @@ def list_files_in_directory(subdir: str, with_metadata: bool = False) -> List:
             return valid_files
             
     except Exception as e:
-        print(f"Error listando archivos en {subdir}: {e}")
+        logger.error("Error listando archivos en %s: %s", subdir, e)
         return []
 
 
@@ -421,7 +727,7 @@ def upload_file_to_ftp(local_file_path: str, subdir: str, filename: str) -> bool
         public_url, remote_path = upload_file(local_file_path, subdir, filename)
         return remote_path is not None
     except Exception as e:
-        print(f"Error subiendo archivo {filename} a {subdir}: {e}")
+        logger.error("Error subiendo archivo %s a %s: %s", filename, subdir, e)
         return False
 
 
@@ -439,16 +745,67 @@ def move_file_in_ftp(source_subdir: str, target_subdir: str, filename: str) -> b
     Wrapper de la función move_file principal.
     """
     try:
-        print(f"🔍 DEBUG: move_file_in_ftp llamado para {filename} de {source_subdir} a {target_subdir}")
+        logger.debug("move_file_in_ftp llamado para %s de %s a %s", filename, source_subdir, target_subdir)
         result = move_file(source_subdir, target_subdir, filename)
         success = result is not None
-        print(f"🔍 DEBUG: move_file_in_ftp resultado: {success} (result: {result})")
+        logger.debug("move_file_in_ftp resultado: %s (result: %s)", success, result)
         return success
     except Exception as e:
-        print(f"❌ DEBUG: Error en move_file_in_ftp para {filename}: {e}")
+        logger.error("Error en move_file_in_ftp para %s: %s", filename, e)
         return False
 
 
+def upload_files_to_ftp(items: List[Tuple[str, str, str]]) -> List[bool]:
+    """
+    Sube varios archivos en paralelo sobre conexiones del pool.
+
+    Args:
+        items: lista de tuplas (local_file_path, subdir, filename)
+
+    Returns:
+        Lista de booleanos en el mismo orden que items
+    """
+    if not items:
+        return []
+    max_workers = min(len(items), FTP_POOL_SIZE)
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        return list(ex.map(lambda item: upload_file_to_ftp(*item), items))
+
+
+def delete_files_from_ftp(items: List[Tuple[str, str]]) -> List[bool]:
+    """
+    Elimina varios archivos en paralelo sobre conexiones del pool.
+
+    Args:
+        items: lista de tuplas (subdir, filename)
+
+    Returns:
+        Lista de booleanos en el mismo orden que items
+    """
+    if not items:
+        return []
+    max_workers = min(len(items), FTP_POOL_SIZE)
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        return list(ex.map(lambda item: delete_file_from_ftp(*item), items))
+
+
+def move_files_in_ftp(items: List[Tuple[str, str, str]]) -> List[bool]:
+    """
+    Mueve varios archivos en paralelo sobre conexiones del pool.
+
+    Args:
+        items: lista de tuplas (source_subdir, target_subdir, filename)
+
+    Returns:
+        Lista de booleanos en el mismo orden que items
+    """
+    if not items:
+        return []
+    max_workers = min(len(items), FTP_POOL_SIZE)
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        return list(ex.map(lambda item: move_file_in_ftp(*item), items))
+
+
 def download_file_from_ftp(subdir: str, filename: str, local_path: str) -> bool:
     """
     Descarga un archivo del servidor FTP a una ruta local.
@@ -459,13 +816,79 @@ def download_file_from_ftp(subdir: str, filename: str, local_path: str) -> bool:
         
         with ftp_connection() as ftp:
             with open(local_path, 'wb') as local_file:
-                ftp.retrbinary(f'RETR {remote_path}', local_file.write)
+                ftp.retrbinary(f'RETR {remote_path}', local_file.write, blocksize=TRANSFER_BLOCKSIZE)
             return True
     except Exception as e:
-        print(f"Error descargando archivo {filename} de {subdir}: {e}")
+        logger.error("Error descargando archivo %s de %s: %s", filename, subdir, e)
         return False
 
 
+def _parse_mlsd_listing(ftp: FTP, remote_dir: str) -> List[dict]:
+    """Lista archivos PDF con metadatos usando MLSD (hechos estructurados)."""
+    files_with_metadata = []
+    for filename, facts in ftp.mlsd(remote_dir, facts=['type', 'size', 'modify']):
+        if facts.get('type') != 'file':
+            continue
+        if not filename.endswith(_PDF_SUFFIXES) or filename in _SKIP_ENTRIES:
+            continue
+
+        size_fact = facts.get('size', '0')
+        size = int(size_fact) if size_fact.isdigit() else 0
+        modify = facts.get('modify', '')
+        try:
+            modified_at = datetime.strptime(modify[:14], '%Y%m%d%H%M%S')
+            date_str = modified_at.strftime('%b %d %H:%M')
+            date_iso = modified_at.isoformat()
+        except ValueError:
+            date_str = ''
+            date_iso = datetime.now().isoformat()
+
+        files_with_metadata.append({
+            "filename": filename,
+            "size": size,
+            "size_formatted": _format_file_size(size),
+            "date": date_str,
+            "date_iso": date_iso
+        })
+    return files_with_metadata
+
+
+def _parse_list_listing(ftp: FTP, remote_dir: str) -> List[dict]:
+    """Fallback para servidores sin MLSD: parsea la salida textual de LIST."""
+    ftp.cwd(remote_dir)
+
+    file_list = []
+    ftp.retrlines('LIST', file_list.append)
+
+    files_with_metadata = []
+
+    for line in file_list:
+        # Parsear línea del comando LIST
+        parts = line.split()
+        if len(parts) >= 9:
+            # Verificar que no sea un directorio
+            if not line.startswith('d'):
+                filename = parts[-1]  # El último elemento es el nombre del archivo
+
+                # Filtrar solo archivos PDF válidos
+                if filename.endswith(_PDF_SUFFIXES) and filename not in _SKIP_ENTRIES:
+                    try:
+                        size = int(parts[4]) if parts[4].isdigit() else 0
+                        date_str = f"{parts[5]} {parts[6]} {parts[7]}"
+
+                        files_with_metadata.append({
+                            "filename": filename,
+                            "size": size,
+                            "size_formatted": _format_file_size(size),
+                            "date": date_str,
+                            "date_iso": _parse_ftp_date_to_iso(date_str)
+                        })
+                    except (ValueError, IndexError) as e:
+                        logger.warning("Error parseando archivo %s: %s", filename, e)
+                        continue
+    return files_with_metadata
+
+
 def _get_files_with_metadata(subdir: str, use_cache: bool = True) -> List[dict]:
     """
     Función interna para obtener metadatos de archivos con caché.
@@ -473,79 +896,46 @@ def _get_files_with_metadata(subdir: str, use_cache: bool = True) -> List[dict]:
     """
     cache_key = f"metadata_{subdir}"
     
-    # Verificar caché si está habilitado
+    # Verificar caché si está habilitado (TTLCache descarta lo expirado solo)
     if use_cache:
         with _cache_lock:
-            if cache_key in _file_metadata_cache:
-                cache_data = _file_metadata_cache[cache_key]
-                cache_time = cache_data.get('timestamp')
-                
-                # Verificar si el caché sigue siendo válido
-                if cache_time and datetime.now() - cache_time < timedelta(minutes=CACHE_DURATION_MINUTES):
-                    print(f"📋 Usando caché para {subdir} ({len(cache_data.get('files', []))} archivos)")
-                    return cache_data.get('files', [])
+            cached_files = _file_metadata_cache.get(cache_key)
+        if cached_files is not None:
+            logger.debug("Usando caché para %s (%d archivos)", subdir, len(cached_files))
+            return cached_files
     
     try:
         remote_dir = _build_remote_path(subdir)
-        print(f"🔍 Obteniendo metadatos reales de {subdir}...")
+        logger.debug("Obteniendo metadatos reales de %s...", subdir)
         
         with ftp_connection() as ftp:
-            # Cambiar al directorio
-            ftp.cwd(remote_dir)
-            
-            # Obtener lista detallada de archivos
-            file_list = []
-            ftp.retrlines('LIST', file_list.append)
-            
-            files_with_metadata = []
-            
-            for line in file_list:
-                # Parsear línea del comando LIST
-                parts = line.split()
-                if len(parts) >= 9:
-                    # Verificar que no sea un directorio
-                    if not line.startswith('d'):
-                        filename = parts[-1]  # El último elemento es el nombre del archivo
-                        
-                        # Filtrar solo archivos PDF válidos
-                        if filename.lower().endswith('.pdf') and filename not in ['.', '..']:
-                            try:
-                                size = int(parts[4]) if parts[4].isdigit() else 0
-                                date_str = f"{parts[5]} {parts[6]} {parts[7]}"
-                                
-                                files_with_metadata.append({
-                                    "filename": filename,
-                                    "size": size,
-                                    "size_formatted": _format_file_size(size),
-                                    "date": date_str,
-                                    "date_iso": _parse_ftp_date_to_iso(date_str)
-                                })
-                            except (ValueError, IndexError) as e:
-                                print(f"Error parseando archivo {filename}: {e}")
-                                continue
+            try:
+                # MLSD devuelve hechos ya parseables por máquina (RFC 3659):
+                # sin scraping de LIST ni adivinación de fechas, y soporta
+                # nombres con espacios
+                files_with_metadata = _parse_mlsd_listing(ftp, remote_dir)
+            except error_perm:
+                # Servidor sin soporte MLSD: caer al parseo clásico de LIST
+                files_with_metadata = _parse_list_listing(ftp, remote_dir)
             
             # Guardar en caché si está habilitado
             if use_cache:
                 with _cache_lock:
-                    _file_metadata_cache[cache_key] = {
-                        'files': files_with_metadata,
-                        'timestamp': datetime.now()
-                    }
-                    print(f"💾 Metadatos de {subdir} guardados en caché ({len(files_with_metadata)} archivos)")
+                    _file_metadata_cache[cache_key] = files_with_metadata
+                logger.debug("Metadatos de %s guardados en caché (%d archivos)", subdir, len(files_with_metadata))
             
             return files_with_metadata
             
     except Exception as e:
-        error_msg = f"Error obteniendo metadatos de archivos en {subdir}: {e}"
-        print(error_msg)
+        logger.error("Error obteniendo metadatos de archivos en %s: %s", subdir, e)
         
         # Si es un error de red, devolver una lista vacía en lugar de propagar el error
         if "Network is unreachable" in str(e) or "Connection refused" in str(e) or isinstance(e, ConnectionError):
-            print(f"⚠️ FTP no disponible para {subdir}. Devolviendo lista vacía.")
+            logger.warning("FTP no disponible para %s. Devolviendo lista vacía.", subdir)
             return []
         
         # Para otros errores, también devolver lista vacía pero registrar más detalle
-        print(f"⚠️ Error inesperado en FTP para {subdir}: {type(e).__name__}: {e}")
+        logger.warning("Error inesperado en FTP para %s: %s: %s", subdir, type(e).__name__, e)
         return []
 
 
@@ -562,10 +952,14 @@ def clear_metadata_cache(subdir: Optional[str] = None) -> None:
             cache_key = f"metadata_{subdir}"
             if cache_key in _file_metadata_cache:
                 del _file_metadata_cache[cache_key]
-                print(f"🗑️ Caché limpiado para {subdir}")
+                logger.debug("Caché limpiado para %s", subdir)
+            _cedula_index_cache.pop(cache_key, None)
+            _listing_cache.pop(f"listing_{subdir}", None)
         else:
             _file_metadata_cache.clear()
-            print("🗑️ Todo el caché de metadatos limpiado")
+            _cedula_index_cache.clear()
+            _listing_cache.clear()
+            logger.debug("Todo el caché de metadatos limpiado")
 
 
 def _parse_ftp_date_to_iso(date_str: str) -> str:
@@ -579,9 +973,6 @@ def _parse_ftp_date_to_iso(date_str: str) -> str:
         str: Fecha en formato ISO
     """
     try:
-        from datetime import datetime, timedelta
-        import re
-        
         # Parsear la fecha del formato FTP
         # Ejemplo: "Sep 4 11:02" o "Sep 4 2025"
         parts = date_str.split()
@@ -590,13 +981,7 @@ def _parse_ftp_date_to_iso(date_str: str) -> str:
             day = int(parts[1])
             time_or_year = parts[2]
             
-            # Mapeo de meses
-            month_map = {
-                'Jan': 1, 'Feb': 2, 'Mar': 3, 'Apr': 4, 'May': 5, 'Jun': 6,
-                'Jul': 7, 'Aug': 8, 'Sep': 9, 'Oct': 10, 'Nov': 11, 'Dec': 12
-            }
-            
-            month = month_map.get(month_str, 1)
+            month = _MONTH_MAP.get(month_str, 1)
             
             # Determinar año
             current_year = datetime.now().year
@@ -622,7 +1007,7 @@ def _parse_ftp_date_to_iso(date_str: str) -> str:
             return file_date.isoformat()
             
     except Exception as e:
-        print(f"Error parseando fecha {date_str}: {e}")
+        logger.warning("Error parseando fecha %s: %s", date_str, e)
         # Fallback a fecha actual
         return datetime.now().isoformat()
     
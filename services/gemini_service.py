@@ -1,11 +1,21 @@
+import asyncio
+import hashlib
+import logging
 import os
 import google.generativeai as genai
 
+logger = logging.getLogger(__name__)
+
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 genai.configure(api_key=GEMINI_API_KEY)
 
 model = genai.GenerativeModel('gemini-2.0-flash')
 
+# Peticiones en vuelo: prompts idénticos concurrentes comparten una sola
+# llamada a la API; la entrada sobrevive unos segundos para absorber ráfagas
+_INFLIGHT_TTL_SECONDS = 5
+_inflight = {}
+
 def generate_gemini_response(message: str):
     """
     Genera una respuesta utilizando el modelo Gemini.
@@ -14,5 +24,41 @@ def generate_gemini_response(message: str):
         response = model.generate_content(message)
         return response.text
     except Exception as e:
-        print(f"Error al contactar la API de Google: {e}")
-        return "Error al procesar tu mensaje."
\ No newline at end of file
+        logger.error("Error al contactar la API de Google: %s", e)
+        return "Error al procesar tu mensaje."
+
+async def generate_gemini_response_async(message: str) -> str:
+    """
+    Versión asíncrona de generate_gemini_response con deduplicación.
+
+    Usa la API asíncrona del SDK (no bloquea el event loop) y, si ya hay
+    una petición en vuelo para el mismo mensaje, espera su resultado en
+    lugar de emitir otra llamada.
+    """
+    loop = asyncio.get_running_loop()
+    key = hashlib.blake2b(message.encode(), digest_size=16).hexdigest()
+
+    existing = _inflight.get(key)
+    if existing is not None:
+        return await asyncio.shield(existing)
+
+    future = loop.create_future()
+    _inflight[key] = future
+    try:
+        try:
+            response = await model.generate_content_async(message)
+            text = response.text
+        except Exception as e:
+            logger.error("Error al contactar la API de Google: %s", e)
+            text = "Error al procesar tu mensaje."
+        if not future.done():
+            future.set_result(text)
+        loop.call_later(_INFLIGHT_TTL_SECONDS, _inflight.pop, key, None)
+        return text
+    finally:
+        # Si el await se canceló (CancelledError no pasa por except Exception)
+        # el futuro quedaría sin resolver y la clave sin desalojar: los
+        # siguientes llamadores del mismo prompt esperarían para siempre
+        if not future.done():
+            future.cancel()
+            _inflight.pop(key, None)
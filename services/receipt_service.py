@@ -1,9 +1,37 @@
+import logging
 import os
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from typing import Tuple, Optional
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from models.payment_models import PaymentReceipt, PaymentUser
 from services.validation_service import ValidationService
-from services.whatsapp_service import send_whatsapp_document, send_whatsapp_message, send_whatsapp_document_url, send_whatsapp_interactive_buttons
+from services.ftp_service import find_files_by_cedula, find_files_by_cedula_multi, download_to_bytes
+from services.whatsapp_service import send_whatsapp_document, send_whatsapp_document_bytes, send_whatsapp_message, send_whatsapp_document_url, send_whatsapp_interactive_buttons
+
+logger = logging.getLogger(__name__)
+
+# Marcadores de rutas de comprobantes remotas: basta con 'recientes/' y
+# 'anteriores/' porque también cubren las variantes con '/' inicial
+_FTP_MARKERS = ("recientes/", "anteriores/")
+
+# Base FTP normalizada una vez al importar: evita el os.getenv + rstrip
+# en cada búsqueda (la variable de entorno no cambia en caliente)
+_FTP_BASE = os.getenv("FTP_BASE_DIR", "").rstrip('/')
+_FTP_BASE_PREFIX = f"{_FTP_BASE}/" if _FTP_BASE else "/"
+
+# Prompt de selección de quincena: texto y botones son fijos, así que se
+# construyen una sola vez (send_whatsapp_interactive_buttons solo los lee)
+_RECEIPT_BODY = (
+    "🧾 *Comprobantes de pago*\n\n"
+    "Por favor selecciona que comprobante deseas recibir:"
+)
+_RECEIPT_BUTTONS = (
+    {'id': '1', 'title': 'Quincena anterior'},
+    {'id': '2', 'title': 'Quincena actual'},
+)
+
 
 class ReceiptService:
     """Servicio para manejar comprobantes de pago"""
@@ -38,9 +66,9 @@ class ReceiptService:
             return False, date_message
         
         # Paso 3: Buscar los últimos dos comprobantes (solo por cédula)
-        print(f"🔍 DEBUG: Iniciando búsqueda de comprobantes para cédula {cedula}")
-        success, message, receipts = ReceiptService.get_last_two_receipts(db, cedula)
-        print(f"🔍 DEBUG: Resultado búsqueda - Éxito: {success}, Comprobantes: {len(receipts) if receipts else 0}")
+        logger.debug("Iniciando búsqueda de comprobantes para cédula %s", cedula)
+        success, message, receipts = ReceiptService.get_last_two_receipts(cedula)
+        logger.debug("Resultado búsqueda - Éxito: %s, Comprobantes: %d", success, len(receipts) if receipts else 0)
         
         if not success:
             return False, message
@@ -51,35 +79,16 @@ class ReceiptService:
             return False, "No se encontraron comprobantes de pago para los datos proporcionados"
         else:
             # Hay comprobantes en al menos una carpeta, mostrar botones
-            body_text = (
-                f"🧾 *Comprobantes de pago*\n\n"
-                f"Por favor selecciona que comprobante deseas recibir:"
-            )
-            
-            # Definir los botones
-            buttons = [
-                {
-                    'id': '1',
-                    'title': 'Quincena anterior'
-                },
-                {
-                    'id': '2', 
-                    'title': 'Quincena actual'
-                }
-            ]
-            
-            # Enviar mensaje con botones
-            send_whatsapp_interactive_buttons(phone_number, body_text, buttons)
+            send_whatsapp_interactive_buttons(phone_number, _RECEIPT_BODY, _RECEIPT_BUTTONS)
             return True, "options_sent"
     
     @staticmethod
-    def get_last_two_receipts(db: Session, cedula: str, expedition_date: str = None) -> Tuple[bool, str, list]:
+    def get_last_two_receipts(cedula: str, expedition_date: str = None) -> Tuple[bool, str, list]:
         """
         Obtiene los comprobantes más recientes de un usuario directamente desde FTP
         (uno de cada carpeta: recientes y anteriores)
         
         Args:
-            db: Sesión de base de datos (mantenido por compatibilidad, no se usa)
             cedula: Número de cédula
             expedition_date: Fecha de expedición (opcional, no se usa)
             
@@ -87,42 +96,31 @@ class ReceiptService:
             Tuple[bool, str, list]: (éxito, mensaje, lista de diccionarios con info de comprobantes)
         """
         try:
-            from services.ftp_service import find_files_by_cedula
-            import os
-            
             result_receipts = []
             remote_folders = ["recientes", "anteriores"]
-            
-            for folder in remote_folders:
-                try:
-                    # Buscar archivos que contengan la cédula (cualquier formato)
-                    matching_files = find_files_by_cedula(folder, cedula)
+
+            # Una sola llamada resuelve las dos carpetas (en paralelo cuando
+            # hay que tocar la red; sin red cuando la caché está caliente)
+            results_by_folder = find_files_by_cedula_multi(remote_folders, cedula)
+
+            for folder, matching_files in results_by_folder.items():
+                if matching_files:
+                    # Tomar el primer archivo encontrado de esta carpeta
+                    selected_file = matching_files[0]
                     
-                    if matching_files:
-                        # Tomar el primer archivo encontrado de esta carpeta
-                        selected_file = matching_files[0]
-                        
-                        # Construir la ruta remota
-                        ftp_base_dir = os.getenv("FTP_BASE_DIR", "")
-                        if ftp_base_dir:
-                            file_path = f"{ftp_base_dir.rstrip('/')}/{folder}/{selected_file}"
-                        else:
-                            file_path = f"/{folder}/{selected_file}"
-                        
-                        # Crear objeto de comprobante
-                        receipt_data = {
-                            'cedula': cedula,
-                            'file_path': file_path,
-                            'file_name': selected_file,
-                            'folder': folder,
-                            'total_found': len(matching_files)
-                        }
-                        result_receipts.append(receipt_data)
-                        
-                except (ValueError, ConnectionError, Exception):
-                    # Continuar con la siguiente carpeta si hay error
-                    continue
-            
+                    # Construir la ruta remota
+                    file_path = f"{_FTP_BASE_PREFIX}{folder}/{selected_file}"
+                    
+                    # Crear objeto de comprobante
+                    receipt_data = {
+                        'cedula': cedula,
+                        'file_path': file_path,
+                        'file_name': selected_file,
+                        'folder': folder,
+                        'total_found': len(matching_files)
+                    }
+                    result_receipts.append(receipt_data)
+
             if not result_receipts:
                 return False, f"No se encontraron comprobantes de pago para la cédula {cedula}", []
             
@@ -132,12 +130,11 @@ class ReceiptService:
             return False, f"Error al buscar comprobantes: {str(e)}", []
     
     @staticmethod
-    def get_receipts_by_folder(db: Session, cedula: str, folder: str) -> Tuple[bool, str, list]:
+    def get_receipts_by_folder(cedula: str, folder: str) -> Tuple[bool, str, list]:
         """
         OPTIMIZACIÓN: Busca comprobantes solo en una carpeta específica.
         
         Args:
-            db: Sesión de base de datos (mantenido por compatibilidad, no se usa)
             cedula: Número de cédula
             folder: Carpeta específica a buscar ('recientes' o 'anteriores')
             
@@ -145,9 +142,6 @@ class ReceiptService:
             Tuple[bool, str, list]: (éxito, mensaje, lista de diccionarios con info de comprobantes)
         """
         try:
-            from services.ftp_service import find_files_by_cedula
-            import os
-            
             # Validar que la carpeta sea válida
             if folder not in ["recientes", "anteriores"]:
                 return False, f"Carpeta inválida: {folder}", []
@@ -162,11 +156,7 @@ class ReceiptService:
             selected_file = matching_files[0]
             
             # Construir la ruta remota
-            ftp_base_dir = os.getenv("FTP_BASE_DIR", "")
-            if ftp_base_dir:
-                file_path = f"{ftp_base_dir.rstrip('/')}/{folder}/{selected_file}"
-            else:
-                file_path = f"/{folder}/{selected_file}"
+            file_path = f"{_FTP_BASE_PREFIX}{folder}/{selected_file}"
             
             # Crear objeto de comprobante
             receipt_data = {
@@ -206,65 +196,79 @@ class ReceiptService:
             # Si es un diccionario (datos FTP), usar la nueva función
             return ReceiptService._send_receipt_pdf_from_data(receipt_data, phone_number)
     
+    @staticmethod
+    def _send_from_ftp(
+        file_path: str,
+        file_name: str,
+        phone_number: str,
+        confirmation_message: Optional[str] = None
+    ) -> Tuple[bool, str]:
+        """
+        Descarga un comprobante del FTP a memoria y lo envía por WhatsApp.
+
+        Lógica común a los dos caminos de envío (datos FTP y PaymentReceipt
+        con ruta remota). Si se pasa confirmation_message, se envía en
+        paralelo con la descarga (best-effort: su fallo no corta el envío).
+
+        Returns:
+            Tuple[bool, str]: (éxito, mensaje)
+        """
+        logger.debug("Descargando archivo FTP: %s", file_path)
+        if confirmation_message is not None:
+            # La confirmación y la descarga FTP son independientes: se lanzan
+            # a la vez y solo se espera la descarga
+            with ThreadPoolExecutor(max_workers=2) as ex:
+                ex.submit(send_whatsapp_message, phone_number, confirmation_message)
+                pdf_bytes = ex.submit(download_to_bytes, file_path).result()
+        else:
+            pdf_bytes = download_to_bytes(file_path)
+
+        if pdf_bytes is None:
+            logger.error("Error al descargar archivo FTP: %s", file_path)
+            return False, "No fue posible descargar el archivo del repositorio remoto"
+
+        success = send_whatsapp_document_bytes(
+            to=phone_number,
+            data=pdf_bytes,
+            filename=file_name
+        )
+        logger.debug("Resultado envío WhatsApp: %s", success)
+
+        if success:
+            return True, "Comprobante enviado exitosamente"
+        else:
+            return False, "Error al enviar el archivo PDF"
+
     @staticmethod
     def _send_receipt_pdf_from_data(receipt_data: dict, phone_number: str) -> Tuple[bool, str]:
         """
         Envía el PDF del comprobante por WhatsApp desde datos FTP
-        
+
         Args:
             receipt_data: Diccionario con datos del comprobante (file_path, file_name, etc.)
             phone_number: Número de teléfono destino
-            
+
         Returns:
             Tuple[bool, str]: (éxito, mensaje)
         """
         try:
             file_path = receipt_data['file_path']
             file_name = receipt_data['file_name']
-            
-            print(f"🔍 DEBUG: Enviando PDF desde FTP")
-            print(f"🔍 DEBUG: Ruta del archivo: {file_path}")
-            print(f"🔍 DEBUG: Nombre del archivo: {file_name}")
-            
+
+            logger.debug("Enviando PDF desde FTP: %s (%s)", file_path, file_name)
+
             # Enviar mensaje de confirmación
             confirmation_message = (
                 f"✅ *Comprobante de pago encontrado*\n\n"
                 f"Te estoy enviando el PDF del comprobante..."
             )
-            
-            send_whatsapp_message(phone_number, confirmation_message)
-            
-            # Descargar temporalmente desde FTP y enviar
-            from services.ftp_service import download_to_temp
-            print(f"🔍 DEBUG: Descargando archivo FTP: {file_path}")
-            temp_path = download_to_temp(file_path)
-            if not temp_path:
-                print(f"❌ DEBUG: Error al descargar archivo FTP")
-                return False, "No fue posible descargar el archivo del repositorio remoto"
-            
-            print(f"🔍 DEBUG: Archivo descargado temporalmente en: {temp_path}")
-            try:
-                success = send_whatsapp_document(
-                    to=phone_number,
-                    file_path=temp_path,
-                    filename=file_name
-                )
-                print(f"🔍 DEBUG: Resultado envío WhatsApp: {success}")
-            finally:
-                try:
-                    if os.path.exists(temp_path):
-                        os.remove(temp_path)
-                        print(f"🔍 DEBUG: Archivo temporal eliminado")
-                except Exception:
-                    pass
-            
-            if success:
-                return True, "Comprobante enviado exitosamente"
-            else:
-                return False, "Error al enviar el archivo PDF"
-                
+
+            return ReceiptService._send_from_ftp(
+                file_path, file_name, phone_number, confirmation_message
+            )
+
         except Exception as e:
-            print(f"❌ DEBUG: Error al procesar el envío: {str(e)}")
+            logger.error("Error al procesar el envío: %s", e)
             return False, f"Error al procesar el envío: {str(e)}"
     
     @staticmethod
@@ -279,25 +283,24 @@ class ReceiptService:
         Returns:
             Tuple[bool, str]: (éxito, mensaje)
         """
-        # Detectar el tipo de archivo
-        is_url = isinstance(receipt.file_path, str) and receipt.file_path.lower().startswith(("http://", "https://"))
-        
+        # Detectar el tipo de archivo (una sola pasada por la ruta: el lower()
+        # se calcula una vez y los marcadores FTP se prueban en una sola tupla)
+        file_path = receipt.file_path if isinstance(receipt.file_path, str) else ""
+        # Solo el esquema es insensible a mayúsculas: basta con minusculizar
+        # los primeros 8 caracteres en vez de la ruta completa
+        is_url = file_path[:8].lower().startswith(("http://", "https://"))
+
         # Detectar si es una ruta FTP remota (puede empezar con / o con el FTP_BASE_DIR)
-        is_remote_ftp_path = False
-        if isinstance(receipt.file_path, str):
-            # Ruta absoluta FTP o ruta que contiene carpetas de recibos
-            if (receipt.file_path.startswith("/") and any(folder in receipt.file_path for folder in ["/recientes/", "/anteriores/"])) or \
-               any(folder in receipt.file_path for folder in ["recientes/", "anteriores/"]):
-                is_remote_ftp_path = True
-        
-        # Solo verificar existencia local si no es URL ni ruta FTP remota
+        is_remote_ftp_path = any(marker in file_path for marker in _FTP_MARKERS)
+
+        # Solo verificar existencia local si no es URL ni ruta FTP remota:
+        # así no se paga un stat() (potencialmente bloqueante) por rutas remotas
         if not is_url and not is_remote_ftp_path:
             # Verificar que el archivo existe localmente
             if not os.path.exists(receipt.file_path):
                 return False, "El archivo del comprobante no se encuentra en el servidor"
         
-        print(f"🔍 DEBUG: Tipo de archivo - URL: {is_url}, FTP remoto: {is_remote_ftp_path}")
-        print(f"🔍 DEBUG: Ruta del archivo: {receipt.file_path}")
+        logger.debug("Tipo de archivo - URL: %s, FTP remoto: %s (%s)", is_url, is_remote_ftp_path, receipt.file_path)
         
         try:
             # Enviar mensaje de confirmación
@@ -310,39 +313,20 @@ class ReceiptService:
             
             # Enviar el PDF
             if is_url:
-                print(f"🔍 DEBUG: Enviando como URL pública")
+                logger.debug("Enviando como URL pública")
                 success = send_whatsapp_document_url(
                     to=phone_number,
                     file_url=receipt.file_path,
                     filename=receipt.file_name
                 )
             elif is_remote_ftp_path:
-                print(f"🔍 DEBUG: Enviando desde FTP remoto")
-                # Descargar temporalmente desde FTP y enviar
-                from services.ftp_service import download_to_temp
-                print(f"🔍 DEBUG: Descargando archivo FTP: {receipt.file_path}")
-                temp_path = download_to_temp(receipt.file_path)
-                if not temp_path:
-                    print(f"❌ DEBUG: Error al descargar archivo FTP")
-                    return False, "No fue posible descargar el archivo del repositorio remoto"
-                
-                print(f"🔍 DEBUG: Archivo descargado temporalmente en: {temp_path}")
-                try:
-                    success = send_whatsapp_document(
-                        to=phone_number,
-                        file_path=temp_path,
-                        filename=receipt.file_name
-                    )
-                    print(f"🔍 DEBUG: Resultado envío WhatsApp: {success}")
-                finally:
-                    try:
-                        if os.path.exists(temp_path):
-                            os.remove(temp_path)
-                            print(f"🔍 DEBUG: Archivo temporal eliminado")
-                    except Exception:
-                        pass
+                logger.debug("Enviando desde FTP remoto")
+                # La confirmación ya se envió arriba (es común a las tres ramas)
+                return ReceiptService._send_from_ftp(
+                    receipt.file_path, receipt.file_name, phone_number
+                )
             else:
-                print(f"🔍 DEBUG: Enviando archivo local")
+                logger.debug("Enviando archivo local")
                 success = send_whatsapp_document(
                     to=phone_number,
                     file_path=receipt.file_path,
@@ -401,25 +385,29 @@ class ReceiptService:
         if not os.path.exists(file_path):
             return False, "El archivo PDF no existe en la ruta especificada", None
         
-        # Verificar que no existe un comprobante con la misma ruta
-        existing_receipt = db.query(PaymentReceipt).filter(
-            PaymentReceipt.file_path == file_path
-        ).first()
+        # Verificar que no existe un comprobante con la misma ruta: basta un
+        # SELECT del id con LIMIT 1, sin hidratar el objeto ORM completo
+        existing_id = db.execute(
+            select(PaymentReceipt.id).filter_by(file_path=file_path).limit(1)
+        ).scalar()
         
-        if existing_receipt:
+        if existing_id is not None:
             return False, "Ya existe un comprobante con esa ruta de archivo", None
         
         try:
-            # Crear el comprobante
+            # Crear el comprobante con los defaults resueltos en el cliente:
+            # así el commit no necesita un refresh (SELECT extra) para que el
+            # llamador pueda serializar el objeto
             receipt = PaymentReceipt(
                 cedula=cedula,
                 file_path=file_path,
-                file_name=file_name
+                file_name=file_name,
+                is_active=True,
+                created_at=datetime.now()
             )
             
             db.add(receipt)
             db.commit()
-            db.refresh(receipt)
             
             return True, "Comprobante creado exitosamente", receipt
             
@@ -457,22 +445,29 @@ class ReceiptService:
         if not is_valid_date:
             return False, date_message, None
         
-        # Verificar que no existe un usuario con esa cédula
-        existing_user = db.query(PaymentUser).filter(PaymentUser.cedula == cedula).first()
-        if existing_user:
+        # Verificar que no existe un usuario con esa cédula (solo presencia,
+        # sin materializar la fila)
+        existing_id = db.execute(
+            select(PaymentUser.id).filter_by(cedula=cedula).limit(1)
+        ).scalar()
+        if existing_id is not None:
             return False, "Ya existe un usuario registrado con esa cédula", None
         
         try:
-            # Crear el usuario
+            # Crear el usuario con los defaults resueltos en el cliente
+            # (mismo criterio que create_receipt: sin refresh tras el commit)
+            now = datetime.now()
             user = PaymentUser(
                 cedula=cedula,
                 name=name,
-                expedition_date=expedition_date
+                expedition_date=expedition_date,
+                is_active=True,
+                created_at=now,
+                updated_at=now
             )
             
             db.add(user)
             db.commit()
-            db.refresh(user)
             
             return True, "Usuario creado exitosamente", user
             
@@ -1,12 +1,26 @@
 import re
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Tuple, Optional
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.orm import Session, joinedload
 from models.payment_models import PaymentUser, PaymentReceipt
 
+# Regex precompilado a nivel de módulo: la validación corre en cada mensaje
+# entrante y así se ahorra la consulta al caché interno de re por llamada
+_NON_DIGIT_RE = re.compile(r'[^\d]')
+
 class ValidationService:
     """Servicio para validar datos de usuarios y comprobantes"""
     
+    @staticmethod
+    def _find_active_user(db: Session, cedula: str) -> Optional[PaymentUser]:
+        """Busca el usuario activo de una cédula (consulta única compartida
+        por validate_user_data e is_cedula_registered)."""
+        return db.query(PaymentUser).filter(
+            PaymentUser.cedula == cedula,
+            PaymentUser.is_active == True
+        ).first()
+    
     @staticmethod
     def validate_cedula_format(cedula: str) -> Tuple[bool, str]:
         """
@@ -18,13 +32,18 @@ class ValidationService:
         Returns:
             Tuple[bool, str]: (is_valid, error_message)
         """
+        # Fast path: la mayoría de cédulas llegan ya como dígitos puros
+        # desde el payload de WhatsApp y no necesitan pasar por el regex
+        if cedula.isdigit():
+            return True, "Cédula válida"
+
         # Clean spaces and special characters
-        cedula_clean = re.sub(r'[^\d]', '', cedula)
-        
+        cedula_clean = _NON_DIGIT_RE.sub('', cedula)
+
         # Validate that it only contains numbers
         if not cedula_clean.isdigit():
             return False, "La cédula solo debe contener números"
-        
+
         return True, "Cédula válida"
     
 
@@ -40,41 +59,19 @@ class ValidationService:
         Returns:
             Tuple[bool, str, Optional[datetime]]: (is_valid, error_message, date_object)
         """
-        # Pattern for DD/MM/YYYY
-        date_pattern = r'^(\d{1,2})/(\d{1,2})/(\d{4})$'
-        match = re.match(date_pattern, date_str)
-        
-        if not match:
-            return False, "El formato debe ser DD/MM/AAAA (ejemplo: 15/03/1990)", None
-        
-        day, month, year = map(int, match.groups())
-        
-        # Validate ranges
-        if year < 1900 or year > datetime.now().year:
-            return False, f"El año debe estar entre 1900 y {datetime.now().year}", None
-        
-        if month < 1 or month > 12:
-            return False, "El mes debe estar entre 1 y 12", None
-        
-        if day < 1 or day > 31:
-            return False, "El día debe estar entre 1 y 31", None
-        
-        # Validate specific days per month
-        days_in_month = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
-        
-        # Adjust February for leap years
-        if month == 2 and year % 4 == 0 and (year % 100 != 0 or year % 400 == 0):
-            days_in_month[1] = 29
-        
-        if day > days_in_month[month - 1]:
-            return False, f"El día {day} no es válido para el mes {month}", None
-        
-        # Create datetime object
+        # strptime hace en una sola llamada en C el parseo y la validación de
+        # calendario (rangos de mes/día, 29/02 en bisiestos, etc.)
         try:
-            date_obj = datetime(year, month, day)
-            return True, "Fecha válida", date_obj
+            date_obj = datetime.strptime(date_str.strip(), "%d/%m/%Y")
         except ValueError:
-            return False, "Fecha inválida", None
+            return False, "El formato debe ser DD/MM/AAAA (ejemplo: 15/03/1990)", None
+
+        # Validate year range
+        current_year = datetime.now().year
+        if date_obj.year < 1900 or date_obj.year > current_year:
+            return False, f"El año debe estar entre 1900 y {current_year}", None
+
+        return True, "Fecha válida", date_obj
     
     @staticmethod
     def validate_user_data(db: Session, cedula: str, expedition_date: datetime) -> Tuple[bool, str, Optional[PaymentUser]]:
@@ -90,16 +87,12 @@ class ValidationService:
             Tuple[bool, str, Optional[PaymentUser]]: (is_valid, error_message, user)
         """
         # Search user by cedula
-        user = db.query(PaymentUser).filter(
-            PaymentUser.cedula == cedula,
-            PaymentUser.is_active == True
-        ).first()
+        user = ValidationService._find_active_user(db, cedula)
         
         if not user:
             return False, "No se encontró un usuario registrado con esa cédula", None
         
         # Validate expedition date (with ±1 day tolerance)
-        from datetime import timedelta
         tolerance = timedelta(days=1)
         
         if abs(user.expedition_date - expedition_date) > tolerance:
@@ -120,17 +113,23 @@ class ValidationService:
         Returns:
             Tuple[bool, str, list[PaymentReceipt]]: (success, message, receipts)
         """
-        # First validate that the user exists
-        is_valid, message, user = ValidationService.validate_user_data(db, cedula, expedition_date)
+        # Una sola consulta trae al usuario y sus comprobantes activos
+        # (JOIN): antes eran dos round-trips secuenciales a la base
+        stmt = (
+            select(PaymentUser)
+            .options(joinedload(PaymentUser.receipts))
+            .where(PaymentUser.cedula == cedula, PaymentUser.is_active == True)
+        )
+        user = db.execute(stmt).unique().scalar_one_or_none()
         
-        if not is_valid:
-            return False, message, []
+        if not user:
+            return False, "No se encontró un usuario registrado con esa cédula", []
+        
+        # Validate expedition date (with ±1 day tolerance)
+        if abs(user.expedition_date - expedition_date) > timedelta(days=1):
+            return False, "La fecha de expedición no coincide con nuestros registros", []
         
-        # Search user receipts
-        receipts = db.query(PaymentReceipt).filter(
-            PaymentReceipt.cedula == cedula,
-            PaymentReceipt.is_active == True
-        ).all()
+        receipts = user.receipts
         
         if not receipts:
             return False, "No se encontraron comprobantes de pago para esta cédula", []
@@ -150,10 +149,7 @@ class ValidationService:
             Tuple[bool, str, Optional[PaymentUser]]: (is_registered, message, user)
         """
         # Search user by cedula
-        user = db.query(PaymentUser).filter(
-            PaymentUser.cedula == cedula,
-            PaymentUser.is_active == True
-        ).first()
+        user = ValidationService._find_active_user(db, cedula)
         
         if user:
             return True, f"Usuario registrado: {user.name}", user
@@ -1,103 +1,83 @@
 """
 Módulo de WhatsApp Business API
 Proporciona funcionalidades para mensajería, multimedia y plantillas
-"""
-
-# Importar todas las funciones principales para mantener compatibilidad
-from .core import (
-    validate_whatsapp_config,
-    get_whatsapp_headers,
-    get_base_whatsapp_data
-)
-
-from .messaging import (
-    send_whatsapp_message,
-    send_whatsapp_interactive_buttons
-)
-
-from .media import (
-    upload_media_to_whatsapp,
-    upload_media_from_url_to_whatsapp,
-    upload_media_for_template,
-    upload_media_from_base64,
-    upload_media_from_base64_for_template
-)
-
-from .templates import (
-    create_whatsapp_template,
-    create_whatsapp_template_with_media,
-    create_simple_template_with_media,
-    create_whatsapp_template_with_image_url,
-    create_simple_template_with_image_url,
-    get_whatsapp_templates,
-    send_whatsapp_template,
-    send_whatsapp_template_with_media,
-    delete_whatsapp_template,
-    create_template_with_local_media,
-    create_template_with_base64_media,
-    archive_template,
-    unarchive_template,
-    get_archived_templates
-)
 
-from .documents import (
-    send_whatsapp_document,
-    send_whatsapp_document_url
-)
-
-from .users import (
-    create_or_update_whatsapp_user,
-    get_all_whatsapp_users
-)
-
-# Función de utilidad para formatear nombres de plantillas
-from .templates import format_template_name
+Las funciones se exponen de forma perezosa (PEP 562): importar el paquete
+no compila los submódulos de plantillas/medios que las rutas calientes de
+mensajería nunca usan.
+"""
 
-# Función de utilidad para obtener idioma de plantillas
-from .templates import get_template_language
+import importlib
 
-__all__ = [
+# Mapeo símbolo -> submódulo que lo define; el submódulo solo se importa
+# la primera vez que alguien pide uno de sus símbolos
+_LAZY = {
     # Core
-    'validate_whatsapp_config',
-    'get_whatsapp_headers',
-    'get_base_whatsapp_data',
-    
+    'validate_whatsapp_config': 'core',
+    'get_whatsapp_headers': 'core',
+    'get_base_whatsapp_data': 'core',
+
     # Messaging
-    'send_whatsapp_message',
-    'send_whatsapp_interactive_buttons',
-    
+    'send_whatsapp_message': 'messaging',
+    'send_whatsapp_message_with_response': 'messaging',
+    'send_whatsapp_interactive_buttons': 'messaging',
+    'send_bulk': 'messaging',
+
     # Media
-    'upload_media_to_whatsapp',
-    'upload_media_from_url_to_whatsapp',
-    'upload_media_for_template',
-    'upload_media_from_base64',
-    'upload_media_from_base64_for_template',
-    
+    'upload_media_to_whatsapp': 'media',
+    'upload_media_bytes_to_whatsapp': 'media',
+    'upload_media_from_url_to_whatsapp': 'media',
+    'upload_media_for_template': 'media',
+    'upload_media_from_base64': 'media',
+    'upload_media_from_base64_for_template': 'media',
+
     # Templates
-    'create_whatsapp_template',
-    'create_whatsapp_template_with_media',
-    'create_simple_template_with_media',
-    'create_whatsapp_template_with_image_url',
-    'create_simple_template_with_image_url',
-    'get_whatsapp_templates',
-    'send_whatsapp_template',
-    'send_whatsapp_template_with_media',
-    'delete_whatsapp_template',
-    'create_template_with_local_media',
-    'create_template_with_base64_media',
-    'archive_template',
-    'unarchive_template',
-    'get_archived_templates',
-    
+    'create_whatsapp_template': 'templates',
+    'create_whatsapp_template_with_media': 'templates',
+    'create_simple_template_with_media': 'templates',
+    'create_whatsapp_template_with_image_url': 'templates',
+    'create_simple_template_with_image_url': 'templates',
+    'get_whatsapp_templates': 'templates',
+    'send_whatsapp_template': 'templates',
+    'send_whatsapp_template_with_media': 'templates',
+    'delete_whatsapp_template': 'templates',
+    'create_template_with_local_media': 'templates',
+    'create_template_with_base64_media': 'templates',
+    'archive_template': 'templates',
+    'unarchive_template': 'templates',
+    'get_archived_templates': 'templates',
+
     # Documents
-    'send_whatsapp_document',
-    'send_whatsapp_document_url',
-    
+    'send_whatsapp_message_async': 'async_client',
+    'send_whatsapp_document_async': 'async_client',
+    'send_whatsapp_bulk': 'async_client',
+    'send_whatsapp_document': 'documents',
+    'send_whatsapp_document_bytes': 'documents',
+    'send_whatsapp_document_url': 'documents',
+
     # Users
-    'create_or_update_whatsapp_user',
-    'get_all_whatsapp_users',
-    
+    'create_or_update_whatsapp_user': 'users',
+    'get_all_whatsapp_users': 'users',
+
     # Utilities
-    'format_template_name',
-    'get_template_language'
-]
+    'format_template_name': 'templates',
+    'get_template_language': 'templates',
+}
+
+__all__ = list(_LAZY)
+
+
+def __getattr__(name):
+    try:
+        module_name = _LAZY[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    # Cachear en el namespace del paquete: los accesos siguientes ya no
+    # pasan por __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
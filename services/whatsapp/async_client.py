@@ -0,0 +1,71 @@
+"""
+Módulo de envío asíncrono de WhatsApp Business API
+Contiene wrappers async de los envíos síncronos para despachar lotes en paralelo
+"""
+
+import asyncio
+from typing import Iterable, List, Tuple
+
+from .messaging import send_whatsapp_message
+from .documents import send_whatsapp_document
+
+# Límite de envíos simultáneos para no saturar el pool de conexiones
+# ni los límites de tasa de Meta
+_MAX_CONCURRENT_SENDS = 10
+_send_semaphore = asyncio.Semaphore(_MAX_CONCURRENT_SENDS)
+
+
+async def send_whatsapp_message_async(to: str, message: str) -> bool:
+    """
+    Versión async de send_whatsapp_message.
+
+    Ejecuta el envío síncrono en un hilo (asyncio.to_thread), reutilizando
+    la sesión requests compartida; el semáforo acota cuántos envíos
+    corren a la vez.
+
+    Args:
+        to: Número de teléfono destino
+        message: Texto del mensaje
+
+    Returns:
+        True si se envió exitosamente, False en caso contrario
+    """
+    async with _send_semaphore:
+        return await asyncio.to_thread(send_whatsapp_message, to=to, message=message)
+
+
+async def send_whatsapp_document_async(to: str, file_path: str, filename: str = None) -> bool:
+    """
+    Versión async de send_whatsapp_document.
+
+    Args:
+        to: Número de teléfono destino
+        file_path: Ruta del archivo PDF
+        filename: Nombre del archivo (opcional)
+
+    Returns:
+        True si se envió exitosamente, False en caso contrario
+    """
+    async with _send_semaphore:
+        return await asyncio.to_thread(send_whatsapp_document, to=to, file_path=file_path, filename=filename)
+
+
+async def send_whatsapp_bulk(tasks: Iterable[Tuple[str, str]]) -> List:
+    """
+    Envía un lote de mensajes de texto en paralelo.
+
+    En lugar de N * RTT en serie, los envíos se solapan acotados por el
+    semáforo; las excepciones individuales no tumban el lote
+    (return_exceptions=True).
+
+    Args:
+        tasks: Pares (número destino, mensaje)
+
+    Returns:
+        Lista con el resultado de cada envío (bool o excepción), en el
+        mismo orden que tasks
+    """
+    return await asyncio.gather(
+        *(send_whatsapp_message_async(to, message) for to, message in tasks),
+        return_exceptions=True
+    )
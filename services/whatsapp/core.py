@@ -5,6 +5,11 @@ Contiene funciones de configuración y utilidades base
 
 import os
 from typing import Dict
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
 from .whatsapp_config import (
     WHATSAPP_ACCESS_TOKEN,
     WHATSAPP_PHONE_NUMBER_ID,
@@ -15,6 +20,37 @@ from .whatsapp_config import (
     WHATSAPP_MEDIA_API_URL
 )
 
+# Sesión HTTP compartida hacia graph.facebook.com: el keep-alive reutiliza
+# la conexión TCP+TLS entre llamadas (el handshake cuesta cientos de ms por
+# envío). El Retry reintenta en el transporte los fallos de conexión y las
+# respuestas 429/502/503/504 con backoff exponencial, respetando el header
+# Retry-After que manda Meta al limitar la tasa. El 500 queda fuera a
+# propósito: Meta también lo devuelve tras procesar la petición y
+# reintentarlo podría duplicar mensajes ya entregados.
+_RETRY = Retry(
+    total=5,
+    backoff_factor=0.5,
+    status_forcelist=(429, 502, 503, 504),
+    allowed_methods=frozenset(["GET", "POST"]),
+    respect_retry_after_header=True,
+)
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=50,
+    max_retries=_RETRY,
+))
+
+
+def get_whatsapp_session() -> requests.Session:
+    """
+    Retorna la sesión HTTP compartida para las llamadas a la API de WhatsApp.
+
+    Returns:
+        requests.Session: Sesión con pool de conexiones keep-alive
+    """
+    return _SESSION
+
 def validate_whatsapp_config() -> bool:
     """
     Valida que todas las credenciales de WhatsApp estén configuradas.
@@ -29,17 +65,70 @@ def validate_whatsapp_config() -> bool:
     ]
     return all(required_vars)
 
+# Headers base construidos una sola vez al importar: el f-string del Bearer
+# no tiene por qué formatearse en cada llamada
+_HEADERS = {
+    "Authorization": f"Bearer {WHATSAPP_ACCESS_TOKEN}",
+    "Content-Type": "application/json",
+}
+
+
 def get_whatsapp_headers() -> Dict[str, str]:
     """
     Retorna los headers HTTP estándar para todas las llamadas a la API de WhatsApp.
     
     Returns:
-        dict: Headers con Authorization y Content-Type
+        dict: Copia de los headers con Authorization y Content-Type (copia
+        porque varios llamadores los mutan, p. ej. quitan Content-Type
+        para subidas multipart)
     """
-    return {
-        "Authorization": f"Bearer {WHATSAPP_ACCESS_TOKEN}",
-        "Content-Type": "application/json",
-    }
+    return dict(_HEADERS)
+
+
+# Variante solo-Authorization para subidas multipart y GETs: requests pone
+# el Content-Type por su cuenta y así los llamadores no tienen que borrarlo
+_AUTH_ONLY_HEADERS = {
+    "Authorization": _HEADERS["Authorization"],
+}
+
+
+def get_whatsapp_auth_only_headers() -> Dict[str, str]:
+    """
+    Retorna solo el header Authorization, para llamadas donde el
+    Content-Type lo fija requests (multipart) o no aplica (GET).
+    
+    Returns:
+        dict: Copia del header Authorization
+    """
+    return dict(_AUTH_ONLY_HEADERS)
+
+
+# La API de subida reanudable usa el esquema OAuth en vez de Bearer;
+# el header también se construye una única vez
+_OAUTH_HEADERS = {
+    "Authorization": f"OAuth {WHATSAPP_ACCESS_TOKEN}",
+}
+
+
+def get_oauth_headers() -> Dict[str, str]:
+    """
+    Retorna los headers con esquema OAuth que usa la API de subida reanudable.
+    
+    Returns:
+        dict: Copia de los headers con Authorization OAuth
+    """
+    return dict(_OAUTH_HEADERS)
+
+
+def get_whatsapp_access_token() -> str:
+    """
+    Retorna el token de acceso crudo, para los llamadores que lo necesitan
+    fuera del header Authorization (p. ej. la subida reanudable).
+    
+    Returns:
+        str: Token de acceso de WhatsApp
+    """
+    return WHATSAPP_ACCESS_TOKEN
 
 def get_base_whatsapp_data(to: str, message_type: str) -> Dict[str, str]:
     """
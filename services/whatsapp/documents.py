@@ -3,12 +3,18 @@ Módulo de documentos de WhatsApp Business API
 Contiene funciones específicas para envío de documentos PDF
 """
 
-import json
+import logging
 import os
 import requests
 from typing import Optional
-from .core import get_whatsapp_headers, get_whatsapp_api_url
-from .media import upload_media_to_whatsapp, upload_media_from_url_to_whatsapp
+from .core import get_whatsapp_headers, get_whatsapp_api_url, get_whatsapp_session
+from .media import (
+    upload_media_to_whatsapp,
+    upload_media_bytes_to_whatsapp,
+    upload_media_from_url_to_whatsapp
+)
+
+logger = logging.getLogger(__name__)
 
 def send_whatsapp_document(to: str, file_path: str, filename: str = None) -> bool:
     """
@@ -29,7 +35,7 @@ def send_whatsapp_document(to: str, file_path: str, filename: str = None) -> boo
     media_id = upload_media_to_whatsapp(file_path, "application/pdf")
     
     if not media_id:
-        print(f"❌ Error: No se pudo subir el archivo PDF")
+        logger.error("Error: No se pudo subir el archivo PDF")
         return False
     
     # Luego enviar el documento usando el media_id
@@ -45,21 +51,73 @@ def send_whatsapp_document(to: str, file_path: str, filename: str = None) -> boo
         }
     }
 
-    print(f"--- Enviando documento PDF a WhatsApp ---")
-    print(f"URL: {get_whatsapp_api_url()}")
-    print(f"Archivo: {filename}")
-    print(f"Media ID: {media_id}")
-    print("-------------------------------------")
+    logger.debug("--- Enviando documento PDF a WhatsApp ---")
+    api_url = get_whatsapp_api_url()
+    logger.debug("URL: %s", api_url)
+    logger.debug("Archivo: %s", filename)
+    logger.debug("Media ID: %s", media_id)
+
+    try:
+        response = get_whatsapp_session().post(api_url, headers=headers, json=data)
+        logger.debug("Respuesta de la API de WhatsApp: %s", response.status_code)
+        logger.debug("Contenido de la respuesta: %s", response.text)
+        response.raise_for_status()
+        logger.debug("Documento PDF enviado a %s exitosamente.", to)
+        return True
+    except requests.exceptions.RequestException as e:
+        logger.error("Error al enviar documento PDF a %s: %s", to, e)
+        return False
+
+def send_whatsapp_document_bytes(to: str, data: bytes, filename: str) -> bool:
+    """
+    Envía un documento (PDF) desde bytes en memoria a un número de WhatsApp.
+
+    Igual que send_whatsapp_document pero sin pasar por disco: el contenido
+    va directo del buffer a la subida multipart de la API de Meta.
+
+    Args:
+        to: Número de teléfono destino
+        data: Contenido del archivo PDF
+        filename: Nombre del archivo
+
+    Returns:
+        True si se envió exitosamente, False en caso contrario
+    """
+    # Primero subir el archivo a WhatsApp
+    media_id = upload_media_bytes_to_whatsapp(data, filename, "application/pdf")
+
+    if not media_id:
+        logger.error("Error: No se pudo subir el archivo PDF")
+        return False
+
+    # Luego enviar el documento usando el media_id
+    headers = get_whatsapp_headers()
+
+    data_msg = {
+        "messaging_product": "whatsapp",
+        "to": to,
+        "type": "document",
+        "document": {
+            "id": media_id,
+            "filename": filename
+        }
+    }
+
+    logger.debug("--- Enviando documento PDF a WhatsApp ---")
+    api_url = get_whatsapp_api_url()
+    logger.debug("URL: %s", api_url)
+    logger.debug("Archivo: %s", filename)
+    logger.debug("Media ID: %s", media_id)
 
     try:
-        response = requests.post(get_whatsapp_api_url(), headers=headers, data=json.dumps(data))
-        print(f"Respuesta de la API de WhatsApp: {response.status_code}")
-        print(f"Contenido de la respuesta: {response.text}")
+        response = get_whatsapp_session().post(api_url, headers=headers, json=data_msg)
+        logger.debug("Respuesta de la API de WhatsApp: %s", response.status_code)
+        logger.debug("Contenido de la respuesta: %s", response.text)
         response.raise_for_status()
-        print(f"Documento PDF enviado a {to} exitosamente.")
+        logger.debug("Documento PDF enviado a %s exitosamente.", to)
         return True
     except requests.exceptions.RequestException as e:
-        print(f"Error al enviar documento PDF a {to}: {e}")
+        logger.error("Error al enviar documento PDF a %s: %s", to, e)
         return False
 
 def send_whatsapp_document_url(to: str, file_url: str, filename: str = None) -> bool:
@@ -81,7 +139,7 @@ def send_whatsapp_document_url(to: str, file_url: str, filename: str = None) ->
     media_id = upload_media_from_url_to_whatsapp(file_url, "application/pdf")
     
     if not media_id:
-        print(f"❌ Error: No se pudo subir el archivo PDF desde la URL")
+        logger.error("Error: No se pudo subir el archivo PDF desde la URL")
         return False
     
     # Luego enviar el documento usando el media_id
@@ -97,20 +155,20 @@ def send_whatsapp_document_url(to: str, file_url: str, filename: str = None) ->
         }
     }
 
-    print(f"--- Enviando documento PDF desde URL a WhatsApp ---")
-    print(f"URL: {get_whatsapp_api_url()}")
-    print(f"Archivo: {filename}")
-    print(f"URL del archivo: {file_url}")
-    print(f"Media ID: {media_id}")
-    print("-------------------------------------")
+    logger.debug("--- Enviando documento PDF desde URL a WhatsApp ---")
+    api_url = get_whatsapp_api_url()
+    logger.debug("URL: %s", api_url)
+    logger.debug("Archivo: %s", filename)
+    logger.debug("URL del archivo: %s", file_url)
+    logger.debug("Media ID: %s", media_id)
 
     try:
-        response = requests.post(get_whatsapp_api_url(), headers=headers, data=json.dumps(data))
-        print(f"Respuesta de la API de WhatsApp: {response.status_code}")
-        print(f"Contenido de la respuesta: {response.text}")
+        response = get_whatsapp_session().post(api_url, headers=headers, json=data)
+        logger.debug("Respuesta de la API de WhatsApp: %s", response.status_code)
+        logger.debug("Contenido de la respuesta: %s", response.text)
         response.raise_for_status()
-        print(f"Documento PDF enviado a {to} exitosamente.")
+        logger.debug("Documento PDF enviado a %s exitosamente.", to)
         return True
     except requests.exceptions.RequestException as e:
-        print(f"Error al enviar documento PDF a {to}: {e}")
+        logger.error("Error al enviar documento PDF a %s: %s", to, e)
         return False
@@ -3,17 +3,36 @@ Módulo de medios de WhatsApp Business API
 Contiene funciones para subida y manejo de archivos multimedia
 """
 
+import logging
+import io
 import os
-import tempfile
+import time
+import threading
+import hashlib
 import base64
 import requests
 from typing import Optional
+from cachetools import TTLCache
 from .core import (
     get_whatsapp_headers,
+    get_whatsapp_auth_only_headers,
+    get_oauth_headers,
     get_whatsapp_media_api_url,
-    get_whatsapp_app_id
+    get_whatsapp_app_id,
+    get_whatsapp_access_token,
+    get_whatsapp_session
 )
 
+logger = logging.getLogger(__name__)
+
+# Caché de media_ids ya subidos, clave (sha256 del contenido, tipo MIME).
+# Al difundir un mismo PDF a muchos destinatarios la subida se hace una sola
+# vez. Los media_id de Meta caducan a los 30 días; el TTL de 25 deja margen.
+_MEDIA_ID_CACHE = TTLCache(maxsize=128, ttl=25 * 24 * 3600)
+# TTLCache no es seguro entre hilos y estas subidas corren en el threadpool
+# de FastAPI y en send_bulk; mismo patrón de lock que los cachés del FTP
+_media_cache_lock = threading.RLock()
+
 def upload_media_to_whatsapp(file_path: str, file_type: str = "image/jpeg") -> Optional[str]:
     """
     Sube un archivo multimedia a WhatsApp Business API y devuelve el media_id.
@@ -25,41 +44,74 @@ def upload_media_to_whatsapp(file_path: str, file_type: str = "image/jpeg") -> O
     Returns:
         media_id si es exitoso, None si falla
     """
-    # Obtener headers centralizados (sin Content-Type para upload de archivos)
-    headers = get_whatsapp_headers()
-    del headers["Content-Type"]  # Remover Content-Type para upload de archivos
-    
+    # El multipart de requests carga el archivo en memoria de todas formas;
+    # leerlo aquí permite compartir el caché por hash con la ruta de bytes
     try:
         with open(file_path, 'rb') as file:
-            files = {
-                'file': (os.path.basename(file_path), file, file_type)
-            }
-            
-            # Agregar el parámetro messaging_product requerido
-            data = {
-                'messaging_product': 'whatsapp'
-            }
-            
-            print(f"--- Subiendo medio a WhatsApp ---")
-            print(f"Archivo: {file_path}")
-            print(f"Tipo: {file_type}")
-            print("-------------------------------------")
-            
-            response = requests.post(get_whatsapp_media_api_url(), headers=headers, files=files, data=data)
-            print(f"Respuesta al subir medio: {response.status_code}")
-            print(f"Contenido: {response.text}")
-            
-            if response.status_code == 200:
-                result = response.json()
-                media_id = result.get('id')
-                print(f"✅ Medio subido exitosamente. Media ID: {media_id}")
-                return media_id
-            else:
-                print(f"❌ Error al subir medio: {response.text}")
-                return None
-                
+            file_data = file.read()
+    except OSError as e:
+        logger.error("Error al leer archivo para subir: %s", e)
+        return None
+
+    return upload_media_bytes_to_whatsapp(file_data, os.path.basename(file_path), file_type)
+
+def upload_media_bytes_to_whatsapp(data: bytes, filename: str, file_type: str = "image/jpeg") -> Optional[str]:
+    """
+    Sube un archivo multimedia a WhatsApp Business API desde bytes en memoria.
+
+    Evita el paso por un archivo temporal cuando el contenido ya está en
+    memoria (por ejemplo, un PDF recién descargado del FTP).
+
+    Args:
+        data: Contenido del archivo
+        filename: Nombre del archivo
+        file_type: Tipo MIME del archivo (ej: "application/pdf")
+
+    Returns:
+        media_id si es exitoso, None si falla
+    """
+    cache_key = (hashlib.sha256(data).hexdigest(), file_type)
+    with _media_cache_lock:
+        cached_id = _MEDIA_ID_CACHE.get(cache_key)
+    if cached_id:
+        logger.debug("Medio ya subido, reutilizando Media ID: %s", cached_id)
+        return cached_id
+
+    # Solo Authorization: el Content-Type del multipart lo pone requests
+    headers = get_whatsapp_auth_only_headers()
+
+    try:
+        files = {
+            'file': (filename, data, file_type)
+        }
+
+        # Agregar el parámetro messaging_product requerido
+        data_params = {
+            'messaging_product': 'whatsapp'
+        }
+
+        logger.debug("--- Subiendo medio desde memoria a WhatsApp ---")
+        logger.debug("Archivo: %s", filename)
+        logger.debug("Tipo: %s", file_type)
+
+        response = get_whatsapp_session().post(get_whatsapp_media_api_url(), headers=headers, files=files, data=data_params)
+        logger.debug("Respuesta al subir medio: %s", response.status_code)
+        logger.debug("Contenido: %s", response.text)
+
+        if response.status_code == 200:
+            result = response.json()
+            media_id = result.get('id')
+            if media_id:
+                with _media_cache_lock:
+                    _MEDIA_ID_CACHE[cache_key] = media_id
+            logger.debug("Medio subido exitosamente. Media ID: %s", media_id)
+            return media_id
+        else:
+            logger.error("Error al subir medio: %s", response.text)
+            return None
+
     except Exception as e:
-        print(f"❌ Error al subir medio: {e}")
+        logger.error("Error al subir medio: %s", e)
         return None
 
 def upload_media_from_url_to_whatsapp(file_url: str, file_type: str = "image/jpeg") -> Optional[str]:
@@ -73,42 +125,143 @@ def upload_media_from_url_to_whatsapp(file_url: str, file_type: str = "image/jpe
     Returns:
         media_id si es exitoso, None si falla
     """
-    headers = get_whatsapp_headers()
-    
+    # Cachear también por URL evita repetir la propia descarga
+    url_key = (f"url:{file_url}", file_type)
+    with _media_cache_lock:
+        cached_id = _MEDIA_ID_CACHE.get(url_key)
+    if cached_id:
+        logger.debug("Medio ya subido desde esta URL, reutilizando Media ID: %s", cached_id)
+        return cached_id
+
     try:
         # Descargar el archivo desde la URL
-        print(f"--- Descargando archivo desde URL ---")
-        print(f"URL: {file_url}")
-        print("-------------------------------------")
+        logger.debug("--- Descargando archivo desde URL ---")
+        logger.debug("URL: %s", file_url)
         
-        response = requests.get(file_url, timeout=30)
+        response = get_whatsapp_session().get(file_url, timeout=30)
         if response.status_code != 200:
-            print(f"❌ Error al descargar archivo: HTTP {response.status_code}")
+            logger.error("Error al descargar archivo: HTTP %s", response.status_code)
             return None
         
         # Obtener el nombre del archivo de la URL
         filename = os.path.basename(file_url)
         
-        # Crear un archivo temporal
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(filename)[1]) as temp_file:
-            temp_file.write(response.content)
-            temp_file_path = temp_file.name
+        # El cuerpo descargado va directo al multipart de subida: sin archivo
+        # temporal de por medio se ahorran las dos pasadas por disco
+        media_id = upload_media_bytes_to_whatsapp(response.content, filename, file_type)
+        if media_id:
+            with _media_cache_lock:
+                _MEDIA_ID_CACHE[url_key] = media_id
+        return media_id
         
-        try:
-            # Subir el archivo temporal usando la función existente
-            media_id = upload_media_to_whatsapp(temp_file_path, file_type)
-            return media_id
-        finally:
-            # Limpiar el archivo temporal
-            try:
-                os.unlink(temp_file_path)
-            except:
-                pass
-                
     except Exception as e:
-        print(f"❌ Error al subir medio desde URL: {e}")
+        logger.error("Error al subir medio desde URL: %s", e)
+        return None
+
+# Tamaño de chunk y reintentos de la subida reanudable: ante un fallo
+# transitorio solo se repite el chunk afectado, no el archivo entero
+_RESUMABLE_CHUNK_SIZE = 4 * 1024 * 1024
+_RESUMABLE_MAX_RETRIES = 3
+
+def _resumable_upload(file_obj, file_name: str, file_size: int, file_type: str) -> Optional[str]:
+    """
+    Sube un archivo con la API de subida reanudable de Facebook en chunks de 4 MB.
+
+    Inicializa la sesión en el endpoint /uploads y avanza file_offset chunk a
+    chunk; si un POST falla se reintenta solo ese chunk con backoff
+    exponencial en vez de reiniciar la subida completa. Opera sobre un
+    objeto de archivo para aceptar tanto archivos en disco como buffers
+    en memoria (io.BytesIO).
+
+    Args:
+        file_obj: Objeto de archivo binario posicionado al inicio
+        file_name: Nombre del archivo a reportar a la API
+        file_size: Tamaño total en bytes
+        file_type: Tipo MIME del archivo
+
+    Returns:
+        header_handle si es exitoso, None si falla
+    """
+    # Paso 1: Inicializar la sesión de subida reanudable
+    # Según la documentación, debe usar APP_ID, no BUSINESS_ACCOUNT_ID
+    app_id = get_whatsapp_app_id()
+    if not app_id:
+        logger.error("Error: WHATSAPP_APP_ID no está configurado en las variables de entorno")
+        return None
+
+    init_url = f"https://graph.facebook.com/v20.0/{app_id}/uploads"
+
+    # Parámetros según la documentación oficial de Facebook
+    init_params = {
+        "file_name": file_name,
+        "file_length": file_size,
+        "file_type": file_type,
+        "access_token": get_whatsapp_access_token()
+    }
+
+    logger.debug("--- Inicializando subida reanudable ---")
+    logger.debug("Archivo: %s", file_name)
+    logger.debug("Tamaño: %s bytes", file_size)
+    logger.debug("Tipo: %s", file_type)
+
+    # Inicializar sesión usando parámetros de query según la documentación
+    init_response = get_whatsapp_session().post(init_url, params=init_params)
+    logger.debug("Respuesta inicialización: %s", init_response.status_code)
+    logger.debug("Contenido: %s", init_response.text)
+
+    if init_response.status_code != 200:
+        logger.error("Error al inicializar subida: %s", init_response.text)
         return None
 
+    session_id = init_response.json().get('id')
+    if not session_id:
+        logger.error("No se obtuvo session_id")
+        return None
+
+    logger.debug("Sesión iniciada: %s", session_id)
+
+    # Paso 2: Subir el archivo chunk a chunk avanzando file_offset
+    upload_url = f"https://graph.facebook.com/v20.0/{session_id}"
+    upload_result = None
+
+    offset = 0
+    while offset < file_size:
+        chunk = file_obj.read(_RESUMABLE_CHUNK_SIZE)
+        if not chunk:
+            break
+
+        # Esta API usa OAuth en vez de Bearer; el header viene ya construido
+        upload_headers = get_oauth_headers()
+        upload_headers["file_offset"] = str(offset)
+
+        upload_response = None
+        for attempt in range(_RESUMABLE_MAX_RETRIES):
+            try:
+                upload_response = get_whatsapp_session().post(
+                    upload_url, headers=upload_headers, data=chunk
+                )
+                if upload_response.status_code == 200:
+                    break
+                logger.error("Error al subir chunk en offset %s: %s", offset, upload_response.text)
+            except requests.exceptions.RequestException as e:
+                logger.error("Error de red al subir chunk en offset %s: %s", offset, e)
+                upload_response = None
+            time.sleep(0.5 * (2 ** attempt))
+        else:
+            logger.error("Chunk en offset %s agotó los reintentos", offset)
+            return None
+
+        upload_result = upload_response.json()
+        offset += len(chunk)
+
+    header_handle = upload_result.get('h') if upload_result else None
+    if header_handle:
+        logger.debug("Archivo subido exitosamente. Header Handle: %s", header_handle)
+        return header_handle
+
+    logger.error("No se obtuvo header_handle")
+    return None
+
 def upload_media_for_template(file_path: str, file_type: str = "image/jpeg") -> Optional[str]:
     """
     Sube un archivo usando la API de subida reanudable de Facebook para obtener un header_handle
@@ -122,82 +275,12 @@ def upload_media_for_template(file_path: str, file_type: str = "image/jpeg") ->
         header_handle si es exitoso, None si falla
     """
     try:
-        # Paso 1: Inicializar la sesión de subida reanudable
-        # Según la documentación, debe usar APP_ID, no BUSINESS_ACCOUNT_ID
-        app_id = get_whatsapp_app_id()
-        if not app_id:
-            print(f"❌ Error: WHATSAPP_APP_ID no está configurado en las variables de entorno")
-            return None
-            
-        init_url = f"https://graph.facebook.com/v20.0/{app_id}/uploads"
-        
-        headers = get_whatsapp_headers()
-        headers["Content-Type"] = "application/json"
-        
-        file_size = os.path.getsize(file_path)
-        
-        # Parámetros según la documentación oficial de Facebook
-        init_params = {
-            "file_name": os.path.basename(file_path),
-            "file_length": file_size,
-            "file_type": file_type,
-            "access_token": get_whatsapp_headers()["Authorization"].split(" ")[1]
-        }
-        
-        print(f"--- Inicializando subida reanudable ---")
-        print(f"Archivo: {file_path}")
-        print(f"Tamaño: {file_size} bytes")
-        print(f"Tipo: {file_type}")
-        
-        # Inicializar sesión usando parámetros de query según la documentación
-        init_response = requests.post(init_url, params=init_params)
-        print(f"Respuesta inicialización: {init_response.status_code}")
-        print(f"Contenido: {init_response.text}")
-        
-        if init_response.status_code != 200:
-            print(f"❌ Error al inicializar subida: {init_response.text}")
-            return None
-            
-        init_result = init_response.json()
-        session_id = init_result.get('id')
-        
-        if not session_id:
-            print(f"❌ No se obtuvo session_id")
-            return None
-            
-        print(f"✅ Sesión iniciada: {session_id}")
-        
-        # Paso 2: Subir el archivo
-        upload_url = f"https://graph.facebook.com/v20.0/{session_id}"
-        
-        upload_headers = get_whatsapp_headers()
-        upload_headers["file_offset"] = "0"
-        # Cambiar Bearer por OAuth para esta API específica
-        upload_headers["Authorization"] = f"OAuth {get_whatsapp_headers()['Authorization'].split(' ')[1]}"
-        
+        # Un único os.stat en vez de getsize (que hace su propio stat por dentro)
+        file_size = os.stat(file_path).st_size
         with open(file_path, 'rb') as file:
-            file_data = file.read()
-            
-        upload_response = requests.post(upload_url, headers=upload_headers, data=file_data)
-        print(f"Respuesta subida: {upload_response.status_code}")
-        print(f"Contenido: {upload_response.text}")
-        
-        if upload_response.status_code != 200:
-            print(f"❌ Error al subir archivo: {upload_response.text}")
-            return None
-            
-        upload_result = upload_response.json()
-        header_handle = upload_result.get('h')
-        
-        if header_handle:
-            print(f"✅ Archivo subido exitosamente. Header Handle: {header_handle}")
-            return header_handle
-        else:
-            print(f"❌ No se obtuvo header_handle")
-            return None
-            
+            return _resumable_upload(file, os.path.basename(file_path), file_size, file_type)
     except Exception as e:
-        print(f"❌ Error en subida reanudable: {e}")
+        logger.error("Error en subida reanudable: %s", e)
         return None
 
 def upload_media_from_base64_for_template(base64_data: str, filename: str, file_type: str = "image/jpeg") -> Optional[str]:
@@ -213,24 +296,14 @@ def upload_media_from_base64_for_template(base64_data: str, filename: str, file_
         header_handle si es exitoso, None si falla
     """
     try:
-        # Decodificar base64 y guardar temporalmente
+        # Los bytes decodificados van directos a la subida reanudable envueltos
+        # en un BytesIO: sin archivo temporal desaparecen la escritura, la
+        # relectura y la copia extra en memoria
         file_data = base64.b64decode(base64_data)
-        
-        with tempfile.NamedTemporaryFile(delete=False, suffix=f".{filename.split('.')[-1]}") as temp_file:
-            temp_file.write(file_data)
-            temp_file_path = temp_file.name
-        
-        try:
-            # Usar la función de subida reanudable
-            header_handle = upload_media_for_template(temp_file_path, file_type)
-            return header_handle
-        finally:
-            # Limpiar archivo temporal
-            if os.path.exists(temp_file_path):
-                os.unlink(temp_file_path)
-                
+        return _resumable_upload(io.BytesIO(file_data), filename, len(file_data), file_type)
+
     except Exception as e:
-        print(f"❌ Error en subida base64 para plantilla: {e}")
+        logger.error("Error en subida base64 para plantilla: %s", e)
         return None
 
 def upload_media_from_base64(base64_data: str, filename: str, file_type: str = "image/jpeg") -> Optional[str]:
@@ -245,39 +318,12 @@ def upload_media_from_base64(base64_data: str, filename: str, file_type: str = "
     Returns:
         media_id si es exitoso, None si falla
     """
-    headers = get_whatsapp_headers()
-    
     try:
-        # Decodificar base64
         file_data = base64.b64decode(base64_data)
-        
-        files = {
-            'file': (filename, file_data, file_type)
-        }
-        
-        # Agregar el parámetro messaging_product requerido
-        data = {
-            'messaging_product': 'whatsapp'
-        }
-        
-        print(f"--- Subiendo medio desde base64 ---")
-        print(f"Archivo: {filename}")
-        print(f"Tipo: {file_type}")
-        print("-------------------------------------")
-        
-        response = requests.post(get_whatsapp_media_api_url(), headers=headers, files=files, data=data)
-        print(f"Respuesta al subir medio: {response.status_code}")
-        print(f"Contenido: {response.text}")
-        
-        if response.status_code == 200:
-            result = response.json()
-            media_id = result.get('id')
-            print(f"✅ Medio subido exitosamente. Media ID: {media_id}")
-            return media_id
-        else:
-            print(f"❌ Error al subir medio: {response.text}")
-            return None
-            
     except Exception as e:
-        print(f"❌ Error al subir medio: {e}")
+        logger.error("Error al decodificar base64: %s", e)
         return None
+
+    logger.debug("--- Subiendo medio desde base64 ---")
+    # Delegar en la ruta de bytes comparte el caché de media_ids por hash
+    return upload_media_bytes_to_whatsapp(file_data, filename, file_type)
@@ -3,30 +3,43 @@ Módulo de mensajería de WhatsApp Business API
 Contiene funciones para envío de mensajes de texto e interactivos
 """
 
+import logging
 import json
 import requests
-from typing import List, Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, List, Dict, Optional, Tuple
 from .core import (
     validate_whatsapp_config,
     get_whatsapp_headers,
     get_base_whatsapp_data,
-    get_whatsapp_api_url
+    get_whatsapp_api_url,
+    get_whatsapp_session
 )
 
-def send_whatsapp_message(to: str, message: str) -> bool:
+logger = logging.getLogger(__name__)
+
+# Las credenciales no cambian en caliente: validarlas una vez al importar
+# evita repetir la comprobación en cada mensaje
+_CONFIG_OK = validate_whatsapp_config()
+
+def send_whatsapp_message_with_response(to: str, message: str) -> Optional[Dict]:
     """
-    Envía un mensaje de texto a un número de WhatsApp a través de la API de Meta.
+    Envía un mensaje de texto y retorna el payload de respuesta de la API.
+    
+    Para los llamadores que necesitan el id que asigna WhatsApp al mensaje
+    (messages[0].id), por ejemplo para persistirlo en la base de datos.
     
     Args:
         to: Número de teléfono destino
         message: Mensaje de texto a enviar
     
     Returns:
-        bool: True si se envió exitosamente, False en caso contrario
+        dict con la respuesta de la API si se envió exitosamente,
+        None en caso contrario
     """
-    # Validar configuración
-    if not validate_whatsapp_config():
-        print("❌ Error: Configuración de WhatsApp incompleta")
+    # Validar configuración (comprobada una vez al importar el módulo)
+    if not _CONFIG_OK:
+        logger.error("Error: Configuración de WhatsApp incompleta")
         return False
     
     # Obtener headers centralizados
@@ -36,22 +49,39 @@ def send_whatsapp_message(to: str, message: str) -> bool:
     data = get_base_whatsapp_data(to, "text")
     data["text"] = {"body": message}
 
-    print(f"--- Enviando mensaje a WhatsApp ---")
-    print(f"URL: {get_whatsapp_api_url()}")
-    print(f"Headers: {headers}")
-    print(f"Data: {json.dumps(data)}")
-    print("-------------------------------------")
+    logger.debug("--- Enviando mensaje a WhatsApp ---")
+    api_url = get_whatsapp_api_url()
+    logger.debug("URL: %s", api_url)
+    logger.debug("Headers: %s", headers)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Data: %s", json.dumps(data))
 
     try:
-        response = requests.post(get_whatsapp_api_url(), headers=headers, data=json.dumps(data))
-        print(f"Respuesta de la API de WhatsApp: {response.status_code}")
-        print(f"Contenido de la respuesta: {response.text}")
+        response = get_whatsapp_session().post(api_url, headers=headers, json=data)
+        logger.debug("Respuesta de la API de WhatsApp: %s", response.status_code)
+        logger.debug("Contenido de la respuesta: %s", response.text)
         response.raise_for_status()  # Lanza un error para respuestas 4xx/5xx
-        print(f"Mensaje enviado a {to} exitosamente.")
-        return True
+        logger.debug("Mensaje enviado a %s exitosamente.", to)
+        return response.json()
     except requests.exceptions.RequestException as e:
-        print(f"Error al enviar mensaje a {to}: {e}")
-        return False
+        logger.error("Error al enviar mensaje a %s: %s", to, e)
+        return None
+    except ValueError as e:
+        logger.error("Respuesta sin JSON válido al enviar mensaje a %s: %s", to, e)
+        return None
+
+def send_whatsapp_message(to: str, message: str) -> bool:
+    """
+    Envía un mensaje de texto a un número de WhatsApp a través de la API de Meta.
+    
+    Args:
+        to: Número de teléfono destino
+        message: Mensaje de texto a enviar
+    
+    Returns:
+        bool: True si se envió exitosamente, False en caso contrario
+    """
+    return send_whatsapp_message_with_response(to, message) is not None
 
 def send_whatsapp_interactive_buttons(to: str, body_text: str, buttons: List[Dict[str, str]]) -> bool:
     """
@@ -67,32 +97,30 @@ def send_whatsapp_interactive_buttons(to: str, body_text: str, buttons: List[Dic
         bool: True si se envió exitosamente, False si hubo error
     """
     if not buttons or len(buttons) > 3:
-        print("❌ Error: Se requieren entre 1 y 3 botones")
+        logger.error("Error: Se requieren entre 1 y 3 botones")
         return False
     
-    # Validar que cada botón tenga los campos requeridos
+    # Validar y construir la estructura para la API en una sola pasada
+    interactive_buttons = []
     for i, button in enumerate(buttons):
         if not isinstance(button, dict) or 'id' not in button or 'title' not in button:
-            print(f"❌ Error: El botón {i+1} debe tener 'id' y 'title'")
+            logger.error("Error: El botón %s debe tener 'id' y 'title'", i+1)
             return False
-        if len(button['title']) > 20:
-            print(f"❌ Error: El título del botón {i+1} no puede exceder 20 caracteres")
+        title = button['title']
+        if len(title) > 20:
+            logger.error("Error: El título del botón %s no puede exceder 20 caracteres", i+1)
             return False
-    
-    # Obtener headers centralizados
-    headers = get_whatsapp_headers()
-    
-    # Construir la estructura de botones para la API de WhatsApp
-    interactive_buttons = []
-    for button in buttons:
         interactive_buttons.append({
             "type": "reply",
             "reply": {
                 "id": button['id'],
-                "title": button['title']
+                "title": title
             }
         })
     
+    # Obtener headers centralizados
+    headers = get_whatsapp_headers()
+    
     # Construir datos usando función helper
     data = get_base_whatsapp_data(to, "interactive")
     data["interactive"] = {
@@ -105,19 +133,39 @@ def send_whatsapp_interactive_buttons(to: str, body_text: str, buttons: List[Dic
         }
     }
 
-    print(f"--- Enviando mensaje con botones a WhatsApp ---")
-    print(f"URL: {get_whatsapp_api_url()}")
-    print(f"Headers: {headers}")
-    print(f"Data: {json.dumps(data, indent=2)}")
-    print("-------------------------------------")
+    logger.debug("--- Enviando mensaje con botones a WhatsApp ---")
+    api_url = get_whatsapp_api_url()
+    logger.debug("URL: %s", api_url)
+    logger.debug("Headers: %s", headers)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Data: %s", json.dumps(data, indent=2))
 
     try:
-        response = requests.post(get_whatsapp_api_url(), headers=headers, data=json.dumps(data))
-        print(f"Respuesta de la API de WhatsApp: {response.status_code}")
-        print(f"Contenido de la respuesta: {response.text}")
+        response = get_whatsapp_session().post(api_url, headers=headers, json=data)
+        logger.debug("Respuesta de la API de WhatsApp: %s", response.status_code)
+        logger.debug("Contenido de la respuesta: %s", response.text)
         response.raise_for_status()
-        print(f"Mensaje con botones enviado a {to} exitosamente.")
+        logger.debug("Mensaje con botones enviado a %s exitosamente.", to)
         return True
     except requests.exceptions.RequestException as e:
-        print(f"Error al enviar mensaje con botones a {to}: {e}")
+        logger.error("Error al enviar mensaje con botones a %s: %s", to, e)
         return False
+
+def send_bulk(fn: Callable[..., bool], args_iter: Iterable[Tuple], concurrency: int = 5) -> List[bool]:
+    """
+    Ejecuta una función de envío síncrona sobre un lote con concurrencia acotada.
+
+    Pensado para notificaciones masivas (comprobantes, avisos): en vez de
+    recorrer los destinatarios en serie, reparte las llamadas entre hilos
+    que comparten la sesión requests del módulo.
+
+    Args:
+        fn: Función de envío (ej: send_whatsapp_message)
+        args_iter: Iterable de tuplas con los argumentos posicionales de cada llamada
+        concurrency: Número máximo de envíos simultáneos
+
+    Returns:
+        Lista con el resultado de cada llamada, en el mismo orden que args_iter
+    """
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(lambda args: fn(*args), args_iter))
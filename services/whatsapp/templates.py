@@ -3,15 +3,20 @@ Módulo de plantillas de WhatsApp Business API
 Contiene funciones para creación, envío y gestión de plantillas
 """
 
+import logging
 import json
 import re
 import requests
 from typing import Optional, Dict, Any
 from .core import (
     get_whatsapp_headers,
+    get_whatsapp_auth_only_headers,
     get_whatsapp_template_api_url,
-    get_whatsapp_api_url
+    get_whatsapp_api_url,
+    get_whatsapp_session
 )
+
+logger = logging.getLogger(__name__)
 from .media import upload_media_for_template
 
 # Cache para evitar llamadas repetidas a la API
@@ -53,40 +58,39 @@ def get_template_language(template_name: str) -> str:
                     language = template.get('language', 'es_CO')
                     # Guardar en cache
                     _template_language_cache[template_name] = language
-                    print(f"Idioma detectado para plantilla '{template_name}': {language}")
+                    logger.debug("Idioma detectado para plantilla '%s': %s", template_name, language)
                     return language
     except Exception as e:
-        print(f"Error obteniendo idioma de plantilla {template_name}: {e}")
+        logger.error("Error obteniendo idioma de plantilla %s: %s", template_name, e)
     
     # Por defecto
     _template_language_cache[template_name] = "es_CO"
-    print(f"Usando idioma por defecto para plantilla '{template_name}': es_CO")
+    logger.debug("Usando idioma por defecto para plantilla '%s': es_CO", template_name)
     return "es_CO"
 
 def get_whatsapp_templates():
     """
     Obtiene todas las plantillas de WhatsApp Business API.
     """
-    # Obtener headers centralizados (sin Content-Type para GET)
-    headers = get_whatsapp_headers()
-    del headers["Content-Type"]  # Remover Content-Type para GET requests
+    # Solo Authorization: el Content-Type no aplica en un GET
+    headers = get_whatsapp_auth_only_headers()
 
-    print(f"Obteniendo plantillas de: {get_whatsapp_template_api_url()}")
+    logger.debug("Obteniendo plantillas de: %s", get_whatsapp_template_api_url())
     
     try:
-        response = requests.get(get_whatsapp_template_api_url(), headers=headers)
-        print(f"Respuesta de WhatsApp API: {response.status_code}")
+        response = get_whatsapp_session().get(get_whatsapp_template_api_url(), headers=headers)
+        logger.debug("Respuesta de WhatsApp API: %s", response.status_code)
         
         if response.status_code == 200:
             data = response.json()
-            print(f"Plantillas encontradas: {len(data.get('data', []))}")
+            logger.debug("Plantillas encontradas: %s", len(data.get('data', [])))
             return data
         else:
-            print(f"Error de WhatsApp API: {response.text}")
+            logger.error("Error de WhatsApp API: %s", response.text)
             return None
             
     except requests.exceptions.RequestException as e:
-        print(f"Error al obtener plantillas: {e}")
+        logger.error("Error al obtener plantillas: %s", e)
         return None
 
 def create_whatsapp_template(name: str, content: str, category: str, language: str = "es", footer: str = None):
@@ -98,7 +102,7 @@ def create_whatsapp_template(name: str, content: str, category: str, language: s
     
     # Formatear el nombre según las reglas de WhatsApp
     formatted_name = format_template_name(name)
-    print(f"Nombre original: '{name}' -> Formateado: '{formatted_name}'")
+    logger.debug("Nombre original: '%s' -> Formateado: '%s'", name, formatted_name)
     
     components = [
         {
@@ -121,19 +125,19 @@ def create_whatsapp_template(name: str, content: str, category: str, language: s
         "components": components
     }
 
-    print(f"--- Creando plantilla en WhatsApp ---")
-    print(f"URL: {get_whatsapp_template_api_url()}")
-    print(f"Data: {json.dumps(data, indent=2)}")
-    print("-------------------------------------")
+    logger.debug("--- Creando plantilla en WhatsApp ---")
+    logger.debug("URL: %s", get_whatsapp_template_api_url())
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Data: %s", json.dumps(data, indent=2))
 
     try:
-        response = requests.post(get_whatsapp_template_api_url(), headers=headers, data=json.dumps(data))
-        print(f"Respuesta al crear plantilla: {response.status_code}")
-        print(f"Contenido: {response.text}")
+        response = get_whatsapp_session().post(get_whatsapp_template_api_url(), headers=headers, json=data)
+        logger.debug("Respuesta al crear plantilla: %s", response.status_code)
+        logger.debug("Contenido: %s", response.text)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
-        print(f"Error al crear plantilla: {e}")
+        logger.error("Error al crear plantilla: %s", e)
         return None
 
 def create_whatsapp_template_with_media(
@@ -154,7 +158,7 @@ def create_whatsapp_template_with_media(
     
     # Formatear el nombre según las reglas de WhatsApp
     formatted_name = format_template_name(name)
-    print(f"Nombre original: '{name}' -> Formateado: '{formatted_name}'")
+    logger.debug("Nombre original: '%s' -> Formateado: '%s'", name, formatted_name)
     
     components = []
     
@@ -195,26 +199,26 @@ def create_whatsapp_template_with_media(
         "components": components
     }
 
-    print(f"--- Creando plantilla con medio en WhatsApp ---")
-    print(f"URL: {get_whatsapp_template_api_url()}")
-    print(f"Data: {json.dumps(data, indent=2)}")
-    print("-------------------------------------")
+    logger.debug("--- Creando plantilla con medio en WhatsApp ---")
+    logger.debug("URL: %s", get_whatsapp_template_api_url())
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Data: %s", json.dumps(data, indent=2))
 
     try:
-        response = requests.post(get_whatsapp_template_api_url(), headers=headers, data=json.dumps(data))
-        print(f"Respuesta al crear plantilla: {response.status_code}")
-        print(f"Contenido: {response.text}")
+        response = get_whatsapp_session().post(get_whatsapp_template_api_url(), headers=headers, json=data)
+        logger.debug("Respuesta al crear plantilla: %s", response.status_code)
+        logger.debug("Contenido: %s", response.text)
         
         if response.status_code == 400:
             error_data = response.json()
-            print(f"Error 400 - Detalles: {error_data}")
+            logger.error("Error 400 - Detalles: %s", error_data)
             # Intentar con una estructura más simple si falla
             return create_simple_template_with_media(name, content, category, header_handle, media_type, language, footer, header_text)
         
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
-        print(f"Error al crear plantilla: {e}")
+        logger.error("Error al crear plantilla: %s", e)
         return None
 
 def create_simple_template_with_media(
@@ -266,19 +270,19 @@ def create_simple_template_with_media(
         "components": components
     }
 
-    print(f"--- Creando plantilla simple con medio en WhatsApp ---")
-    print(f"URL: {get_whatsapp_template_api_url()}")
-    print(f"Data: {json.dumps(data, indent=2)}")
-    print("-------------------------------------")
+    logger.debug("--- Creando plantilla simple con medio en WhatsApp ---")
+    logger.debug("URL: %s", get_whatsapp_template_api_url())
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Data: %s", json.dumps(data, indent=2))
 
     try:
-        response = requests.post(get_whatsapp_template_api_url(), headers=headers, data=json.dumps(data))
-        print(f"Respuesta al crear plantilla simple: {response.status_code}")
-        print(f"Contenido: {response.text}")
+        response = get_whatsapp_session().post(get_whatsapp_template_api_url(), headers=headers, json=data)
+        logger.debug("Respuesta al crear plantilla simple: %s", response.status_code)
+        logger.debug("Contenido: %s", response.text)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
-        print(f"Error al crear plantilla simple: {e}")
+        logger.error("Error al crear plantilla simple: %s", e)
         return None
 
 def create_whatsapp_template_with_image_url(
@@ -298,7 +302,7 @@ def create_whatsapp_template_with_image_url(
     
     # Formatear el nombre según las reglas de WhatsApp
     formatted_name = format_template_name(name)
-    print(f"Nombre original: '{name}' -> Formateado: '{formatted_name}'")
+    logger.debug("Nombre original: '%s' -> Formateado: '%s'", name, formatted_name)
     
     components = []
     
@@ -338,26 +342,26 @@ def create_whatsapp_template_with_image_url(
         "components": components
     }
 
-    print(f"--- Creando plantilla con imagen desde URL ---")
-    print(f"URL: {get_whatsapp_template_api_url()}")
-    print(f"Data: {json.dumps(data, indent=2)}")
-    print("-------------------------------------")
+    logger.debug("--- Creando plantilla con imagen desde URL ---")
+    logger.debug("URL: %s", get_whatsapp_template_api_url())
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Data: %s", json.dumps(data, indent=2))
 
     try:
-        response = requests.post(get_whatsapp_template_api_url(), headers=headers, data=json.dumps(data))
-        print(f"Respuesta al crear plantilla: {response.status_code}")
-        print(f"Contenido: {response.text}")
+        response = get_whatsapp_session().post(get_whatsapp_template_api_url(), headers=headers, json=data)
+        logger.debug("Respuesta al crear plantilla: %s", response.status_code)
+        logger.debug("Contenido: %s", response.text)
         
         if response.status_code == 400:
             error_data = response.json()
-            print(f"Error 400 - Detalles: {error_data}")
+            logger.error("Error 400 - Detalles: %s", error_data)
             # Intentar con una estructura más simple si falla
             return create_simple_template_with_image_url(name, content, category, image_url, language, footer, header_text)
         
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
-        print(f"Error al crear plantilla: {e}")
+        logger.error("Error al crear plantilla: %s", e)
         return None
 
 def create_simple_template_with_image_url(
@@ -406,19 +410,19 @@ def create_simple_template_with_image_url(
         "components": components
     }
 
-    print(f"--- Creando plantilla simple con imagen desde URL ---")
-    print(f"URL: {get_whatsapp_template_api_url()}")
-    print(f"Data: {json.dumps(data, indent=2)}")
-    print("-------------------------------------")
+    logger.debug("--- Creando plantilla simple con imagen desde URL ---")
+    logger.debug("URL: %s", get_whatsapp_template_api_url())
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Data: %s", json.dumps(data, indent=2))
 
     try:
-        response = requests.post(get_whatsapp_template_api_url(), headers=headers, data=json.dumps(data))
-        print(f"Respuesta al crear plantilla simple: {response.status_code}")
-        print(f"Contenido: {response.text}")
+        response = get_whatsapp_session().post(get_whatsapp_template_api_url(), headers=headers, json=data)
+        logger.debug("Respuesta al crear plantilla simple: %s", response.status_code)
+        logger.debug("Contenido: %s", response.text)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
-        print(f"Error al crear plantilla simple: {e}")
+        logger.error("Error al crear plantilla simple: %s", e)
         return None
 
 def send_whatsapp_template(to: str, template_name: str, parameters: dict = None):
@@ -454,20 +458,20 @@ def send_whatsapp_template(to: str, template_name: str, parameters: dict = None)
             }
         ]
 
-    print(f"--- Enviando plantilla a WhatsApp ---")
-    print(f"URL: {get_whatsapp_api_url()}")
-    print(f"Headers: {headers}")
-    print(f"Data: {json.dumps(data, indent=2)}")
-    print("-------------------------------------")
+    logger.debug("--- Enviando plantilla a WhatsApp ---")
+    logger.debug("URL: %s", get_whatsapp_api_url())
+    logger.debug("Headers: %s", headers)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Data: %s", json.dumps(data, indent=2))
 
     try:
-        response = requests.post(get_whatsapp_api_url(), headers=headers, data=json.dumps(data))
-        print(f"Respuesta al enviar plantilla: {response.status_code}")
-        print(f"Contenido de la respuesta: {response.text}")
+        response = get_whatsapp_session().post(get_whatsapp_api_url(), headers=headers, json=data)
+        logger.debug("Respuesta al enviar plantilla: %s", response.status_code)
+        logger.debug("Contenido de la respuesta: %s", response.text)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
-        print(f"Error al enviar plantilla: {e}")
+        logger.error("Error al enviar plantilla: %s", e)
         return None
 
 def send_whatsapp_template_with_media(
@@ -506,7 +510,7 @@ def send_whatsapp_template_with_media(
     # Validar que el tipo de medio sea soportado
     supported_types = ['IMAGE', 'VIDEO', 'DOCUMENT']
     if media_type_upper not in supported_types:
-        print(f"⚠️ Tipo de medio no soportado: {media_type}. Usando IMAGE por defecto.")
+        logger.debug("Tipo de medio no soportado: %s. Usando IMAGE por defecto.", media_type)
         media_type_upper = 'IMAGE'
         media_type_lower = 'image'
     
@@ -528,16 +532,16 @@ def send_whatsapp_template_with_media(
         # Si tenemos media_id específico, usarlo según el tipo de medio
         if media_type_upper == "IMAGE":
             header_component["parameters"][0]["image"] = {"id": media_id}
-            print(f"📷 Enviando plantilla con imagen: {media_id}")
+            logger.debug("📷 Enviando plantilla con imagen: %s", media_id)
         elif media_type_upper == "VIDEO":
             header_component["parameters"][0]["video"] = {"id": media_id}
-            print(f"🎥 Enviando plantilla con video: {media_id}")
+            logger.debug("🎥 Enviando plantilla con video: %s", media_id)
         elif media_type_upper == "DOCUMENT":
             header_component["parameters"][0]["document"] = {"id": media_id}
-            print(f"📄 Enviando plantilla con documento: {media_id}")
+            logger.debug("📄 Enviando plantilla con documento: %s", media_id)
     else:
         # Si no tenemos media_id, intentar subir un archivo placeholder o usar la función regular
-        print(f"⚠️ No hay media_id disponible para plantilla multimedia. Intentando envío como plantilla regular.")
+        logger.debug("No hay media_id disponible para plantilla multimedia. Intentando envío como plantilla regular.")
         return send_whatsapp_template(to, template_name, parameters)
     
     data["template"]["components"].append(header_component)
@@ -551,21 +555,21 @@ def send_whatsapp_template_with_media(
             ]
         })
 
-    print(f"--- Enviando plantilla con medio a WhatsApp ---")
-    print(f"Tipo de medio: {media_type_upper}")
-    print(f"URL: {get_whatsapp_api_url()}")
-    print(f"Headers: {headers}")
-    print(f"Data: {json.dumps(data, indent=2)}")
-    print("-------------------------------------")
+    logger.debug("--- Enviando plantilla con medio a WhatsApp ---")
+    logger.debug("Tipo de medio: %s", media_type_upper)
+    logger.debug("URL: %s", get_whatsapp_api_url())
+    logger.debug("Headers: %s", headers)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Data: %s", json.dumps(data, indent=2))
 
     try:
-        response = requests.post(get_whatsapp_api_url(), headers=headers, data=json.dumps(data))
-        print(f"Respuesta al enviar plantilla: {response.status_code}")
-        print(f"Contenido de la respuesta: {response.text}")
+        response = get_whatsapp_session().post(get_whatsapp_api_url(), headers=headers, json=data)
+        logger.debug("Respuesta al enviar plantilla: %s", response.status_code)
+        logger.debug("Contenido de la respuesta: %s", response.text)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
-        print(f"Error al enviar plantilla: {e}")
+        logger.error("Error al enviar plantilla: %s", e)
         return None
 
 def delete_whatsapp_template(template_name: str):
@@ -574,11 +578,10 @@ def delete_whatsapp_template(template_name: str):
     Solo se pueden eliminar desde el WhatsApp Business Manager.
     Esta función simula la eliminación pero no realiza cambios reales.
     """
-    print(f"--- Eliminación de plantilla simulada ---")
-    print(f"Template Name: {template_name}")
-    print("NOTA: Las plantillas de WhatsApp no se pueden eliminar desde la API.")
-    print("Debe eliminarlas manualmente desde el WhatsApp Business Manager.")
-    print("-------------------------------------")
+    logger.debug("--- Eliminación de plantilla simulada ---")
+    logger.debug("Template Name: %s", template_name)
+    logger.debug("NOTA: Las plantillas de WhatsApp no se pueden eliminar desde la API.")
+    logger.debug("Debe eliminarlas manualmente desde el WhatsApp Business Manager.")
     
     # Simular éxito para mantener la funcionalidad del frontend
     return True
@@ -597,9 +600,9 @@ def create_template_with_local_media(
     Función completa que sube un archivo local usando la API de subida reanudable
     y crea una plantilla de WhatsApp con ese archivo.
     """
-    print(f"--- Creando plantilla con archivo local ---")
-    print(f"Archivo: {file_path}")
-    print(f"Plantilla: {name}")
+    logger.debug("--- Creando plantilla con archivo local ---")
+    logger.debug("Archivo: %s", file_path)
+    logger.debug("Plantilla: %s", name)
     
     # Paso 1: Determinar el tipo MIME del archivo de manera más robusta
     import mimetypes
@@ -662,8 +665,8 @@ def create_template_with_local_media(
     ]
     
     if mime_type not in whatsapp_supported_mimes:
-        print(f"⚠️ Advertencia: Tipo MIME '{mime_type}' no está en la lista de formatos soportados por WhatsApp")
-        print(f"Formatos soportados: {whatsapp_supported_mimes}")
+        logger.debug("Advertencia: Tipo MIME '%s' no está en la lista de formatos soportados por WhatsApp", mime_type)
+        logger.debug("Formatos soportados: %s", whatsapp_supported_mimes)
         # Intentar mapear a un formato soportado
         if mime_type.startswith('image/'):
             mime_type = 'image/jpeg'
@@ -672,17 +675,17 @@ def create_template_with_local_media(
         elif mime_type.startswith('application/'):
             mime_type = 'application/pdf'
     
-    print(f"Tipo MIME detectado: {mime_type}")
-    print(f"Tipo de medio especificado: {media_type}")
+    logger.debug("Tipo MIME detectado: %s", mime_type)
+    logger.debug("Tipo de medio especificado: %s", media_type)
     
     # Paso 2: Subir el archivo usando la API de subida reanudable
     header_handle = upload_media_for_template(file_path, mime_type)
     
     if not header_handle:
-        print(f"❌ Error: No se pudo subir el archivo")
+        logger.error("Error: No se pudo subir el archivo")
         return None
     
-    print(f"✅ Archivo subido. Header Handle: {header_handle}")
+    logger.debug("Archivo subido. Header Handle: %s", header_handle)
     
     # Paso 3: Crear la plantilla con el header_handle
     result = create_simple_template_with_media(
@@ -697,9 +700,9 @@ def create_template_with_local_media(
     )
     
     if result:
-        print(f"✅ Plantilla creada exitosamente: {result}")
+        logger.debug("Plantilla creada exitosamente: %s", result)
     else:
-        print(f"❌ Error al crear la plantilla")
+        logger.error("Error al crear la plantilla")
     
     return result
 
@@ -718,9 +721,9 @@ def create_template_with_base64_media(
     Función completa que sube un archivo desde base64 usando la API de subida reanudable
     y crea una plantilla de WhatsApp con ese archivo.
     """
-    print(f"--- Creando plantilla con archivo base64 ---")
-    print(f"Archivo: {filename}")
-    print(f"Plantilla: {name}")
+    logger.debug("--- Creando plantilla con archivo base64 ---")
+    logger.debug("Archivo: %s", filename)
+    logger.debug("Plantilla: %s", name)
     
     # Paso 1: Determinar el tipo MIME del archivo
     import mimetypes
@@ -736,16 +739,16 @@ def create_template_with_base64_media(
         else:
             mime_type = "image/jpeg"
     
-    print(f"Tipo MIME detectado: {mime_type}")
+    logger.debug("Tipo MIME detectado: %s", mime_type)
     
     # Paso 2: Subir el archivo usando la API de subida reanudable
     header_handle = upload_media_for_template(base64_data, filename, mime_type)
     
     if not header_handle:
-        print(f"❌ Error: No se pudo subir el archivo")
+        logger.error("Error: No se pudo subir el archivo")
         return None
     
-    print(f"✅ Archivo subido. Header Handle: {header_handle}")
+    logger.debug("Archivo subido. Header Handle: %s", header_handle)
     
     # Paso 3: Crear la plantilla con el header_handle
     result = create_simple_template_with_media(
@@ -760,9 +763,9 @@ def create_template_with_base64_media(
     )
     
     if result:
-        print(f"✅ Plantilla creada exitosamente: {result}")
+        logger.debug("Plantilla creada exitosamente: %s", result)
     else:
-        print(f"❌ Error al crear la plantilla")
+        logger.error("Error al crear la plantilla")
     
     return result
 
@@ -780,7 +783,7 @@ def archive_template(db, template_id: str) -> bool:
             # Plantilla local - archivarla en la base de datos
             template.is_archived = True
             db.commit()
-            print(f"✅ Plantilla local '{template.name}' archivada exitosamente")
+            logger.debug("Plantilla local '%s' archivada exitosamente", template.name)
             return True
         else:
             # Plantilla de WhatsApp - crear registro en la base de datos local
@@ -802,16 +805,16 @@ def archive_template(db, template_id: str) -> bool:
                     )
                     db.add(new_template)
                     db.commit()
-                    print(f"✅ Plantilla de WhatsApp '{whatsapp_template['name']}' archivada exitosamente")
+                    logger.debug("Plantilla de WhatsApp '%s' archivada exitosamente", whatsapp_template['name'])
                     return True
                 else:
-                    print(f"❌ Plantilla de WhatsApp con ID '{template_id}' no encontrada")
+                    logger.error("Plantilla de WhatsApp con ID '%s' no encontrada", template_id)
                     return False
             else:
-                print(f"❌ No se pudo obtener información de la plantilla de WhatsApp")
+                logger.error("No se pudo obtener información de la plantilla de WhatsApp")
                 return False
     except Exception as e:
-        print(f"❌ Error al archivar plantilla: {e}")
+        logger.error("Error al archivar plantilla: %s", e)
         db.rollback()
         return False
 
@@ -826,13 +829,13 @@ def unarchive_template(db, template_id: str) -> bool:
         if template:
             template.is_archived = False
             db.commit()
-            print(f"✅ Plantilla '{template.name}' desarchivada exitosamente")
+            logger.debug("Plantilla '%s' desarchivada exitosamente", template.name)
             return True
         else:
-            print(f"❌ Plantilla con ID '{template_id}' no encontrada")
+            logger.error("Plantilla con ID '%s' no encontrada", template_id)
             return False
     except Exception as e:
-        print(f"❌ Error al desarchivar plantilla: {e}")
+        logger.error("Error al desarchivar plantilla: %s", e)
         db.rollback()
         return False
 
@@ -846,5 +849,5 @@ def get_archived_templates(db):
         archived_templates = db.query(Template).filter(Template.is_archived == True).all()
         return archived_templates
     except Exception as e:
-        print(f"❌ Error al obtener plantillas archivadas: {e}")
+        logger.error("Error al obtener plantillas archivadas: %s", e)
         return []
@@ -3,11 +3,14 @@ Módulo de usuarios de WhatsApp Business API
 Contiene funciones para gestión de usuarios en la base de datos
 """
 
+import logging
 from datetime import datetime
 from sqlalchemy import func
 from sqlalchemy.orm import Session
 from models.whatsapp_models import WhatsappUser
 
+logger = logging.getLogger(__name__)
+
 def create_or_update_whatsapp_user(db: Session, phone_number: str, name: str = None):
     """
     Crea o actualiza un usuario de WhatsApp en la base de datos.
@@ -21,7 +24,7 @@ def create_or_update_whatsapp_user(db: Session, phone_number: str, name: str = N
     Returns:
         WhatsappUser: Usuario creado o actualizado
     """
-    user = db.query(WhatsappUser).filter(WhatsappUser.phone_number == phone_number).first()
+    user = db.get(WhatsappUser, phone_number)
     if user:
         user.last_interaction = func.now()
         # Solo actualizar el nombre si el usuario no tiene un nombre personalizado
@@ -63,7 +66,7 @@ def get_whatsapp_user_by_phone(db: Session, phone_number: str):
     Returns:
         WhatsappUser: Usuario encontrado o None
     """
-    return db.query(WhatsappUser).filter(WhatsappUser.phone_number == phone_number).first()
+    return db.get(WhatsappUser, phone_number)
 
 def update_user_last_interaction(db: Session, phone_number: str):
     """
@@ -77,14 +80,14 @@ def update_user_last_interaction(db: Session, phone_number: str):
         bool: True si se actualizó exitosamente
     """
     try:
-        user = db.query(WhatsappUser).filter(WhatsappUser.phone_number == phone_number).first()
+        user = db.get(WhatsappUser, phone_number)
         if user:
             user.last_interaction = func.now()
             db.commit()
             return True
         return False
     except Exception as e:
-        print(f"❌ Error al actualizar última interacción: {e}")
+        logger.error("Error al actualizar última interacción: %s", e)
         db.rollback()
         return False
 
@@ -100,13 +103,13 @@ def delete_whatsapp_user(db: Session, phone_number: str):
         bool: True si se eliminó exitosamente
     """
     try:
-        user = db.query(WhatsappUser).filter(WhatsappUser.phone_number == phone_number).first()
+        user = db.get(WhatsappUser, phone_number)
         if user:
             db.delete(user)
             db.commit()
             return True
         return False
     except Exception as e:
-        print(f"❌ Error al eliminar usuario: {e}")
+        logger.error("Error al eliminar usuario: %s", e)
         db.rollback()
         return False
@@ -1,54 +1,26 @@
 """
 Servicio principal de WhatsApp Business API
 Este archivo mantiene la compatibilidad con el código existente
-importando todas las funciones desde los módulos modulares
+delegando en el paquete services.whatsapp
+
+La delegación es perezosa (PEP 562): un `from services.whatsapp_service
+import send_whatsapp_message` solo carga el submódulo de mensajería, no
+los de plantillas/medios.
 """
 
-from services.whatsapp import *
+import services.whatsapp as _whatsapp
+
+# Mismo catálogo público que el paquete modular
+__all__ = list(_whatsapp.__all__)
+
+
+def __getattr__(name):
+    if name in __all__:
+        value = getattr(_whatsapp, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
-# Re-exportar todas las funciones para mantener compatibilidad
-__all__ = [
-    # Core
-    'validate_whatsapp_config',
-    'get_whatsapp_headers',
-    'get_base_whatsapp_data',
-    
-    # Messaging
-    'send_whatsapp_message',
-    'send_whatsapp_interactive_buttons',
-    
-    # Media
-    'upload_media_to_whatsapp',
-    'upload_media_from_url_to_whatsapp',
-    'upload_media_for_template',
-    'upload_media_from_base64',
-    'upload_media_from_base64_for_template',
-    
-    # Templates
-    'create_whatsapp_template',
-    'create_whatsapp_template_with_media',
-    'create_simple_template_with_media',
-    'create_whatsapp_template_with_image_url',
-    'create_simple_template_with_image_url',
-    'get_whatsapp_templates',
-    'send_whatsapp_template',
-    'send_whatsapp_template_with_media',
-    'delete_whatsapp_template',
-    'create_template_with_local_media',
-    'create_template_with_base64_media',
-    'archive_template',
-    'unarchive_template',
-    'get_archived_templates',
-    
-    # Documents
-    'send_whatsapp_document',
-    'send_whatsapp_document_url',
-    
-    # Users
-    'create_or_update_whatsapp_user',
-    'get_all_whatsapp_users',
-    
-    # Utilities
-    'format_template_name',
-    'get_template_language'
-]
\ No newline at end of file
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -93,6 +93,9 @@ def create_indexes(engine, table_name):
                 conn.execute(text(f"CREATE INDEX IF NOT EXISTS idx_sender ON {table_name} (sender);"))
                 conn.execute(text(f"CREATE INDEX IF NOT EXISTS idx_status ON {table_name} (status);"))
                 conn.execute(text(f"CREATE INDEX IF NOT EXISTS idx_phone_sender ON {table_name} (phone_number, sender);"))
+                # Índice compuesto para el historial por conversación ordenado
+                # por fecha (mismo nombre que el declarado en el modelo)
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_messages_phone_timestamp ON {table_name} (phone_number, timestamp);"))
             elif table_name == "templates":
                 # Índices para búsquedas por categoría y estado
                 conn.execute(text(f"CREATE INDEX IF NOT EXISTS idx_category ON {table_name} (category);"))
@@ -0,0 +1,39 @@
+"""
+Configuración de logging con cola en segundo plano
+Los handlers reales corren en un hilo aparte (QueueListener), de modo que
+las rutas calientes solo encolan el registro y no pagan el write/flush.
+"""
+
+import atexit
+import logging
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
+
+_listener = None
+
+
+def setup_buffered_logging(level: int = logging.INFO) -> None:
+    """
+    Instala un QueueHandler en el logger raíz y mueve los handlers
+    existentes a un QueueListener en un hilo de fondo.
+
+    Es idempotente: llamadas posteriores no hacen nada.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    root = logging.getLogger()
+
+    # Los handlers ya configurados pasan a ejecutarse en el hilo del listener
+    handlers = root.handlers[:] or [logging.StreamHandler()]
+    for handler in handlers:
+        root.removeHandler(handler)
+
+    queue: SimpleQueue = SimpleQueue()
+    root.addHandler(QueueHandler(queue))
+    root.setLevel(level)
+
+    _listener = QueueListener(queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
@@ -0,0 +1,49 @@
+"""
+Almacén en memoria del estado de conversación del chatbot
+El flujo de comprobantes es una máquina de estados efímera: guardarla en
+MySQL costaba un UPDATE + commit por cada turno. Este módulo la mantiene
+en memoria del proceso con un TTL corto, igual que haría un Redis con
+EXPIRE, y la BD solo se toca en eventos con valor durable.
+"""
+
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+# Una conversación abandonada expira sola pasado este tiempo
+CONVERSATION_TTL_SECONDS = 600
+
+
+class ConversationStateStore:
+    """Estado de conversación por número de teléfono, con expiración."""
+
+    def __init__(self, ttl_seconds: int = CONVERSATION_TTL_SECONDS):
+        self._ttl_seconds = ttl_seconds
+        self._entries: Dict[str, Tuple[str, Optional[Dict[str, Any]], float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, phone_number: str) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """Devuelve (estado, datos) de la conversación, o (None, None) si no hay o expiró"""
+        with self._lock:
+            entry = self._entries.get(phone_number)
+            if entry is None:
+                return None, None
+            state, data, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[phone_number]
+                return None, None
+            return state, data
+
+    def set(self, phone_number: str, state: str, data: Optional[Dict[str, Any]] = None) -> None:
+        """Guarda el estado de la conversación y renueva su TTL"""
+        with self._lock:
+            self._entries[phone_number] = (state, data, time.monotonic() + self._ttl_seconds)
+
+    def clear(self, phone_number: str) -> None:
+        """Termina la conversación del número indicado"""
+        with self._lock:
+            self._entries.pop(phone_number, None)
+
+
+# Instancia global del almacén
+conversation_store = ConversationStateStore()
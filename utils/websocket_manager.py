@@ -1,13 +1,26 @@
 from fastapi import WebSocket
 from typing import Dict, Set
 import asyncio
+import weakref
+
+# Máximo de mensajes pendientes por conexión; al llenarse se descarta el más viejo
+SEND_QUEUE_MAXSIZE = 256
 
 class ConnectionManager:
-    """Gestiona las conexiones WebSocket para comunicación en tiempo real"""
-    
+    """Gestiona las conexiones WebSocket para comunicación en tiempo real.
+
+    Cada conexión tiene una cola de envío acotada y una tarea escritora
+    propia: los broadcasts solo encolan (O(1) por conexión), un cliente
+    lento no bloquea a los demás y, si su cola se llena, se descarta el
+    mensaje más viejo en lugar de crecer sin límite. Las colas y tareas
+    se guardan en estructuras débiles para no retener sockets muertos.
+    """
+
     def __init__(self):
         self.active_connections: Dict[str, Set[WebSocket]] = {}
         self.general_connections: Set[WebSocket] = set()
+        self._send_queues: "weakref.WeakKeyDictionary[WebSocket, asyncio.Queue]" = weakref.WeakKeyDictionary()
+        self._writer_tasks: "weakref.WeakKeyDictionary[WebSocket, asyncio.Task]" = weakref.WeakKeyDictionary()
 
     async def connect(self, websocket: WebSocket, phone_number: str):
         """Conecta un WebSocket específico para un número de teléfono"""
@@ -15,12 +28,14 @@ class ConnectionManager:
         if phone_number not in self.active_connections:
             self.active_connections[phone_number] = set()
         self.active_connections[phone_number].add(websocket)
+        self._start_writer(websocket)
         print(f"Cliente conectado al WebSocket para {phone_number}. Total conexiones: {len(self.active_connections[phone_number])}")
 
     async def connect_general(self, websocket: WebSocket):
         """Conecta un WebSocket general para todos los contactos"""
         await websocket.accept()
         self.general_connections.add(websocket)
+        self._start_writer(websocket)
         print(f"Cliente conectado al WebSocket general. Total conexiones: {len(self.general_connections)}")
 
     def disconnect(self, websocket: WebSocket, phone_number: str):
@@ -29,41 +44,73 @@ class ConnectionManager:
             self.active_connections[phone_number].discard(websocket)
             if not self.active_connections[phone_number]:
                 del self.active_connections[phone_number]
+        self._stop_writer(websocket)
         print(f"Cliente desconectado del WebSocket para {phone_number}")
 
     def disconnect_general(self, websocket: WebSocket):
         """Desconecta un WebSocket general"""
         self.general_connections.discard(websocket)
+        self._stop_writer(websocket)
         print(f"Cliente desconectado del WebSocket general")
 
     async def send_message_to_phone(self, phone_number: str, message: dict):
         """Envía mensaje a todas las conexiones de un número específico"""
-        if phone_number in self.active_connections:
-            disconnected_websockets = []
-            for websocket in self.active_connections[phone_number]:
-                try:
-                    await websocket.send_json(message)
-                except Exception as e:
-                    print(f"Error enviando mensaje a WebSocket: {e}")
-                    disconnected_websockets.append(websocket)
-            
-            # Remover conexiones desconectadas
-            for websocket in disconnected_websockets:
-                self.disconnect(websocket, phone_number)
+        for websocket in self.active_connections.get(phone_number, ()):
+            self._enqueue(websocket, message)
 
     async def send_message_to_all(self, message: dict):
         """Envía mensaje a todas las conexiones generales"""
-        disconnected_websockets = []
         for websocket in self.general_connections:
+            self._enqueue(websocket, message)
+
+    def _start_writer(self, websocket: WebSocket):
+        """Crea la cola de envío y la tarea escritora de una conexión"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SEND_QUEUE_MAXSIZE)
+        self._send_queues[websocket] = queue
+        self._writer_tasks[websocket] = asyncio.create_task(self._writer(websocket, queue))
+
+    def _stop_writer(self, websocket: WebSocket):
+        """Cancela la tarea escritora y libera la cola de una conexión"""
+        task = self._writer_tasks.pop(websocket, None)
+        if task:
+            task.cancel()
+        self._send_queues.pop(websocket, None)
+
+    def _enqueue(self, websocket: WebSocket, message: dict):
+        """Encola un mensaje; si la cola está llena descarta el más viejo"""
+        queue = self._send_queues.get(websocket)
+        if queue is None:
+            return
+        try:
+            queue.put_nowait(message)
+        except asyncio.QueueFull:
             try:
+                queue.get_nowait()
+            except asyncio.QueueEmpty:
+                pass
+            queue.put_nowait(message)
+
+    async def _writer(self, websocket: WebSocket, queue: asyncio.Queue):
+        """Drena la cola de una conexión; si el socket falla, lo da de baja"""
+        try:
+            while True:
+                message = await queue.get()
                 await websocket.send_json(message)
-            except Exception as e:
-                print(f"Error enviando mensaje a WebSocket general: {e}")
-                disconnected_websockets.append(websocket)
-        
-        # Remover conexiones desconectadas
-        for websocket in disconnected_websockets:
-            self.disconnect_general(websocket)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Error enviando mensaje a WebSocket: {e}")
+            self._forget(websocket)
+
+    def _forget(self, websocket: WebSocket):
+        """Elimina un socket muerto de todas las tablas de conexiones"""
+        self.general_connections.discard(websocket)
+        for phone_number, connections in list(self.active_connections.items()):
+            connections.discard(websocket)
+            if not connections:
+                del self.active_connections[phone_number]
+        self._writer_tasks.pop(websocket, None)
+        self._send_queues.pop(websocket, None)
 
 # Instancia global del manager
 manager = ConnectionManager()